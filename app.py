@@ -1,49 +1,35 @@
-import os
 import streamlit as st
-import pandas as pd
 
 from functions.custom_css import load_css
+from functions.catalogue import dataset_labels
+from functions import timing
+from functions.main_functions import perf_panel
 
 st.set_page_config(page_title="LAFF", layout="wide")
 
 # pages = ["Burst Viewer", "Population Statistics"]
 # default_page = 0
 
-@st.cache_data
-def load_data(filepath):
-    df = pd.read_csv(filepath)
-    return df
-
 load_css()
 
-COL_PRIMARY = 'rgba(255, 140, 24, 1)'
-COL_SECONDARY = 'rgba(72, 138, 139, 1)'
-COL_TERTIARTY = 'rgba(63, 81, 181, 1)'
+# opt-in performance panel and JSON span logs: LAFF_PERF=1 or ?perf=1
+if st.query_params.get('perf') is not None:
+    st.session_state['perf'] = st.query_params.get('perf') not in ('0', 'false')
+perf = st.session_state.get('perf', timing.env_enabled())
+
+if perf:
+    timing.configure_logging()
+    timing.start()
 
 ###############################################################################
 ### DATASET SELECTION 
 
-datasets = [dt for dt in os.listdir('results')]
-
-def beautify_dataset_name(folder_name):
-    date, version = folder_name.split('_')
-    yy = date[:2]
-    mm = date[2:4]
-    return f"{mm}/20{yy} (laff v{version})"
-dataset_name_map = {beautify_dataset_name(d): d for d in datasets}
+# pages fetch the selected dataset themselves, via functions.catalogue.get_dataset
+with timing.span('dataset_labels'):
+    dataset_name_map = dataset_labels()
 
 selected_dataset = st.sidebar.selectbox("Select dataset", options=dataset_name_map.keys())
-dataset_path = os.path.join('results', dataset_name_map[selected_dataset])
-
-tab_afterglow = load_data(dataset_path + "/afterglow.csv")
-tab_flares = load_data(dataset_path + "/flares.csv")
-tab_pulses = load_data(dataset_path + "/pulses.csv")
-
-LENGTHS = len(tab_afterglow), len(tab_flares), len(tab_pulses)
-
-combined_names = tab_afterglow['GRBname'].unique().tolist() + tab_flares['GRBname'].unique().tolist() + tab_pulses['GRBname'].unique().tolist()
-name_options = sorted(set(combined_names))
-name_options = [x[0:3] + ' ' + x[3:] for x in name_options]
+st.session_state['dataset_folder'] = dataset_name_map[selected_dataset]
 
 
 ###############################################################################
@@ -51,7 +37,14 @@ name_options = [x[0:3] + ' ' + x[3:] for x in name_options]
 pg = st.navigation([
     st.Page('pages/burst_viewer.py', title="Burst Viewer", icon=':material/search:'),
     st.Page('pages/population_stats.py', title="Population Statistics", icon=':material/insert_chart:'),
+    st.Page('pages/compare_releases.py', title="Compare Releases", icon=':material/compare_arrows:'),
     st.Page('pages/about_laff.py', title="About LAFF", icon=':material/help:')
     ])
 
-pg.run()    
\ No newline at end of file
+try:
+    with timing.span('page', page=pg.title):
+        pg.run()
+finally:
+    if perf:
+        recorder = timing.stop(page=pg.title, dataset=st.session_state['dataset_folder'])
+        perf_panel(recorder)
@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+import urllib.request
+import numpy as np
+
+###############################################################################
+### SERVER
+
+SERVER_SCRIPT = 'server.py' # the app with its API, as deployed (see README)
+PORT = 8599
+TIMEOUT = 120
+STARTUP_TIMEOUT = 60
+
+
+def start_server(script=SERVER_SCRIPT, port=PORT, log_path='loadtest_server.log'):
+    """`streamlit run` the app in a child process and wait until it answers its health check."""
+
+    log = open(log_path, 'w')
+    server = subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', script, '--server.headless', 'true',
+                               '--server.port', str(port), '--server.fileWatcherType', 'none',
+                               '--browser.gatherUsageStats', 'false'], stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"the server exited with code {server.returncode}, see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.25)
+
+    server.terminate()
+    raise RuntimeError(f"the server didn't start within {STARTUP_TIMEOUT} s, see {log_path}")
+
+def process_memory_mb(pid):
+    """(current, peak) resident memory of a process in MB, from /proc (Linux only)."""
+
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if name in ('VmRSS', 'VmHWM'):
+                fields[name] = int(value.split()[0]) / 1024 # kB
+
+    return fields['VmRSS'], fields['VmHWM']
+
+
+class MemorySampler(threading.Thread):
+    """Largest resident memory of the server process seen while a scenario runs."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, process_memory_mb(self.pid)[0])
+
+    def stop(self):
+        self.done.set()
+        self.join()
+        self.peak = max(self.peak, process_memory_mb(self.pid)[0])
+        return self.peak
+
+
+def server_errors(log_path, offset):
+    """Errors the server logged after `offset` bytes of its log, e.g. in callbacks or the API."""
+
+    with open(log_path, errors='replace') as f:
+        f.seek(offset)
+        lines = f.read().splitlines()
+
+    return [line.strip() for line in lines if ' ERROR ' in line or line.startswith('Traceback')]
+
+
+###############################################################################
+### SESSION FLOWS
+
+AFTERGLOW_AXES = ['T90', 'Redshift', 'Afterglow Fluence', 'Total Flare Fluence', 'Flare Count']
+COMPONENT_AXES = ['Fluence', 'Duration', 'Peak Time', 'Isotropic Energy', 'Peak Luminosity']
+
+# ForwardMsg.script_finished statuses that end a rerun (a st.rerun/switch_page one is followed by another run)
+RUN_FINISHED = (0, 1, 3) # successfully, with a compile error, fragment run
+
+
+class Session:
+    """One simulated browser tab: a websocket client of the Streamlit server whose reruns are timed.
+
+    Like the frontend, it sends a rerun request with the current page and the
+    widget values it has changed, and reads the script's output until the run
+    finishes. Widgets are found by key, or by label where they have none.
+    """
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.ws = None
+        self.latencies = []
+        self.errors = []
+
+        self.pages = {} # page title: page script hash, from the app's st.navigation
+        self.page_hash = ''
+        self.widgets = {} # key or label: (element type, element proto) of the last run
+        self.states = {} # widget id: WidgetState sent with every rerun
+
+    async def connect(self):
+        import websockets
+
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    ############################################################
+    ## PROTOCOL
+
+    async def rerun(self, page=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        if page is not None:
+            self.page_hash = self.pages.get(page, self.page_hash)
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ''
+        msg.rerun_script.page_script_hash = self.page_hash
+        msg.rerun_script.widget_states.widgets.extend(self.states.values())
+
+        start = time.perf_counter()
+        try:
+            await self.ws.send(msg.SerializeToString())
+            await asyncio.wait_for(self.read_run(), TIMEOUT)
+        except Exception as e: # e.g. a timeout; the session carries on with its next step
+            self.errors.append(f"{type(e).__name__}: {e}")
+        self.latencies.append(time.perf_counter() - start)
+
+    async def read_run(self):
+        """Read the server's messages until the requested run (and any it triggers) finishes."""
+
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        widgets = {}
+
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await self.ws.recv())
+            kind = msg.WhichOneof('type')
+
+            if kind == 'new_session': # a script run starts
+                widgets = {}
+
+            elif kind == 'navigation':
+                self.pages = {p.page_name: p.page_script_hash for p in msg.navigation.app_pages}
+                self.page_hash = msg.navigation.page_script_hash
+
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element_type = msg.delta.new_element.WhichOneof('type')
+                element = getattr(msg.delta.new_element, element_type)
+
+                if element_type == 'exception' and not element.is_warning:
+                    self.errors.append(f"{element.type}: {element.message.splitlines()[0] if element.message else ''}")
+                elif getattr(element, 'id', ''):
+                    key = element.id.rsplit('-', 1)[-1]
+                    widgets[key if key != 'None' else getattr(element, 'label', element_type)] = (element_type, element)
+
+            elif kind == 'page_not_found':
+                self.errors.append(f"page not found: {msg.page_not_found.page_name}")
+
+            elif kind == 'script_finished' and msg.script_finished in RUN_FINISHED:
+                break
+
+        # like the frontend, only the widgets still shown keep their values
+        ids = {element.id for _, element in widgets.values()}
+        self.states = {i: state for i, state in self.states.items() if i in ids}
+        self.widgets = widgets
+
+    def set(self, name, value):
+        """Change a widget of the last run by key or label; False if it isn't shown."""
+
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if name not in self.widgets:
+            return False
+
+        element_type, element = self.widgets[name]
+        state = WidgetState(id=element.id)
+
+        if element_type == 'selectbox':
+            state.string_value = value
+        elif element_type in ('multiselect', 'button_group'):
+            state.string_array_value.data.extend(value if isinstance(value, list) else [value])
+        elif element_type == 'checkbox':
+            state.bool_value = value
+        elif element_type == 'plotly_chart':
+            state.string_value = json.dumps(value)
+        else:
+            raise ValueError(f"can't set a {element_type}")
+
+        self.states[element.id] = state
+        return True
+
+    def options(self, name):
+        return list(self.widgets[name][1].options) if name in self.widgets else []
+
+    ############################################################
+    ## STEPS
+
+    async def open_app(self):
+        await self.connect()
+        await self.rerun()
+
+    async def pick_dataset(self):
+        if self.set("Select dataset", self.rng.choice(self.options("Select dataset"))):
+            await self.rerun()
+
+    async def search_burst(self):
+        await self.rerun("Burst Viewer")
+        if self.set('burst_viewer_entry', self.rng.choice(self.options('burst_viewer_entry'))):
+            await self.rerun()
+
+    async def toggle_plot_mode(self):
+        if 'viewer_plot_mode' not in self.widgets:
+            await self.search_burst()
+        if self.set('viewer_plot_mode', self.rng.choice(["Interactive model", "Fit image"])):
+            await self.rerun()
+
+    async def open_population(self, tab):
+        await self.rerun("Population Statistics")
+        if self.set("Select population:", tab):
+            await self.rerun()
+
+    def population_suffix(self):
+        return 'afterglow' if 'x_axis_afterglow' in self.widgets else 'flares'
+
+    async def change_axes(self):
+        if "Select population:" not in self.widgets:
+            await self.open_population('Afterglows')
+
+        suffix = self.population_suffix()
+        axes = AFTERGLOW_AXES if suffix == 'afterglow' else COMPONENT_AXES
+
+        # one rerun per widget change, as in the browser
+        for key, value in zip((f'x_axis_{suffix}', f'y_axis_{suffix}'), self.rng.sample(axes, 2)):
+            if self.set(key, value):
+                await self.rerun()
+
+    async def highlight_bursts(self):
+        if "Select population:" not in self.widgets:
+            await self.open_population('Afterglows')
+
+        suffix = self.population_suffix()
+        if self.set(f'color_by_{suffix}', 'Specific GRB'):
+            await self.rerun()
+
+        names = self.options(f'shared_grbs_{suffix}')
+        if names and self.set(f'shared_grbs_{suffix}', self.rng.sample(names, 3)):
+            await self.rerun()
+
+    async def click_through(self):
+        """Click a point of the population plot, which opens its burst in the viewer."""
+
+        if "Select population:" not in self.widgets:
+            await self.open_population('Afterglows')
+
+        # the population plot is the only chart without a key
+        if 'plotly_chart' not in self.widgets:
+            return
+
+        chart = self.widgets['plotly_chart'][1]
+        points = [(curve, i, p) for curve, trace in enumerate(json.loads(chart.spec)['data'])
+                  for i, p in enumerate(trace.get('customdata') or []) if isinstance(p, list) and p]
+        if not points:
+            return
+
+        curve, i, customdata = self.rng.choice(points)
+        point = {'curve_number': curve, 'point_number': i, 'point_index': i, 'customdata': customdata}
+        self.set('plotly_chart', {'selection': {'points': [point], 'point_indices': [i], 'box': [], 'lasso': []}})
+        await self.rerun()
+
+
+# scenario: steps run after opening the app, repeated each iteration
+SCENARIOS = {
+    'burst_viewer': lambda s: [s.search_burst, s.toggle_plot_mode, s.search_burst],
+    'population': lambda s: [lambda: s.open_population('Afterglows'), s.change_axes, s.highlight_bursts,
+                             lambda: s.open_population('Pulses/Flares'), s.change_axes, s.highlight_bursts],
+    'click_through': lambda s: [lambda: s.open_population(s.rng.choice(['Afterglows', 'Pulses/Flares'])), s.change_axes, s.click_through],
+    'mixed': lambda s: s.rng.sample([s.pick_dataset, s.search_burst, s.toggle_plot_mode, s.change_axes,
+                                     s.highlight_bursts, s.click_through, lambda: s.open_population('Afterglows')], 5),
+}
+
+
+async def simulate(url, scenario, iterations, seed):
+    """Run one session through a scenario; returns its rerun latencies and error messages."""
+
+    session = Session(url, random.Random(seed))
+
+    try:
+        await session.open_app()
+        for _ in range(iterations):
+            for step in SCENARIOS[scenario](session):
+                await step()
+    except Exception as e: # e.g. the connection dropped
+        session.errors.append(f"{type(e).__name__}: {e}")
+    finally:
+        await session.close()
+
+    return session.latencies, session.errors
+
+async def run_sessions(url, scenario, sessions, iterations, seed):
+    return await asyncio.gather(*(simulate(url, scenario, iterations, seed + i) for i in range(sessions)))
+
+def run_scenario(server, port, scenario, sessions, iterations, seed=0, log_path='loadtest_server.log'):
+    """Drive `sessions` concurrent sessions through a scenario against one running server.
+
+    All sessions share the server's dataset store, caches and memory, as real
+    users do; the memory reported is the server process's.
+    """
+
+    offset = os.path.getsize(log_path)
+    sampler = MemorySampler(server.pid)
+    sampler.start()
+
+    start = time.perf_counter()
+    outcomes = asyncio.run(run_sessions(f"ws://localhost:{port}/_stcore/stream", scenario, sessions, iterations, seed))
+    wall = time.perf_counter() - start
+
+    peak_rss = sampler.stop()
+    logged = server_errors(log_path, offset)
+
+    latencies = np.array([l for lat, _ in outcomes for l in lat]) * 1e3
+    if not len(latencies):
+        latencies = np.array([np.nan])
+
+    messages = [m for _, e in outcomes for m in e] + logged
+
+    return {
+        'scenario': scenario,
+        'sessions': sessions,
+        'iterations': iterations,
+        'reruns': sum(len(lat) for lat, _ in outcomes),
+        'errors': len(messages),
+        'error_messages': sorted(set(messages)),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+        'reruns_per_s': sum(len(lat) for lat, _ in outcomes) / wall,
+        'wall_s': wall,
+        'server_rss_mb': process_memory_mb(server.pid)[0],
+        'server_peak_rss_mb': peak_rss,
+    }
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest',
+                                     description="Simulate concurrent viewer sessions as websocket clients of one `streamlit run` server, "
+                                                 "and report rerun latency and the server's memory.")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--sessions', type=int, default=8, help="concurrent sessions per scenario")
+    parser.add_argument('--iterations', type=int, default=3, help="times each session repeats the scenario")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--app', default=SERVER_SCRIPT, help="script to `streamlit run`")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--server-log', default='loadtest_server.log', help="where the server's output is written")
+    parser.add_argument('--output', default='loadtest_results.json', help="JSON results file, '-' for stdout")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    server = start_server(args.app, args.port, args.server_log)
+    results = []
+
+    try:
+        for scenario in args.scenarios:
+            result = run_scenario(server, args.port, scenario, args.sessions, args.iterations, args.seed, args.server_log)
+
+            results.append(result)
+            print(f"{scenario:<14} {result['reruns']:5d} reruns  p50 {result['p50_ms']:8.1f}  p95 {result['p95_ms']:8.1f}  "
+                  f"p99 {result['p99_ms']:8.1f} ms  server RSS {result['server_rss_mb']:7.1f} MB (peak {result['server_peak_rss_mb']:7.1f})  "
+                  f"errors {result['errors']}", file=sys.stderr)
+            for message in result['error_messages'][:5]:
+                print(f"    {message[:200]}", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {'app': args.app, 'sessions': args.sessions, 'iterations': args.iterations, 'results': results}
+    text = json.dumps(report, indent=1)
+
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
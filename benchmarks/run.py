@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import SCALES, write_synthetic
+from functions.ingest import TABLES, read_csv_table, ingest_dataset, load_table, load_ragged
+from functions.name_index import build_dataset_index, build_search_index, lookup_rows
+from functions.features import PARAM_SETTINGS, afterglow_features, component_features, ComponentPopulation
+from functions.query import query
+
+###############################################################################
+### BENCHMARKS
+
+# representative plot controls for the population figures
+AFTERGLOW_AXES = {'T90': 'T90', 'Afterglow Fluence': 'afterglow_fluence', 'Break Count': 'breaknum'}
+COMPONENT_AXES = {'Isotropic Energy': 'e_iso', 'Peak Luminosity': 'L_p', 'Redshift': 'redshift'}
+LOOKUPS = 200 # bursts looked up per burst viewer benchmark
+
+
+def timed(fn, repeat):
+    """Wall times of `repeat` calls to fn, after one untimed warm-up call."""
+
+    fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def benchmarks(path, rng):
+    """(name, function) pairs for a dataset folder that has already been ingested."""
+
+    # imported here so the loading benchmarks don't include Streamlit's import time
+    from functions.main_functions import (get_table_value, get_table_multiple_values, get_table_list, get_converted_fluence,
+                                          afterglow_figure, flares_figure, density_figure)
+
+    tables = {t: load_table(path, t) for t in TABLES}
+    ragged = {t: load_ragged(path, t, tables[t]) for t in TABLES}
+    name_index = build_dataset_index(tables)
+    search_index = build_search_index(tables)
+
+    names = rng.choice(search_index.names, size=min(LOOKUPS, len(search_index.names)), replace=False)
+    queries = [n[3:9] for n in names] # date prefixes, as typed into the search box
+
+    afterglow = afterglow_features(tables['afterglow'], ragged['afterglow']['fluence'], PARAM_SETTINGS)
+    flares = component_features(tables['flares'], 'flarenum', PARAM_SETTINGS)
+    pulses = component_features(tables['pulses'], 'pulse_num', PARAM_SETTINGS)
+    population = ComponentPopulation(flares, pulses)
+
+    def burst_rows():
+        return [(lookup_rows(tables['afterglow'], name_index['afterglow'], n),
+                 lookup_rows(tables['flares'], name_index['flares'], n),
+                 lookup_rows(tables['pulses'], name_index['pulses'], n)) for n in names]
+
+    looked_up = burst_rows()
+
+    def formatting():
+        for ag, fl, pu in looked_up:
+            get_table_value(ag, 'T90', error='T90_err')
+            get_table_value(ag, 'redshift', error='redshift_err', format='%.2g')
+            get_converted_fluence(ag, ragged['afterglow']['fluence'], 'conversion')
+            get_table_list(ag, ragged['afterglow']['slopes'])
+            get_table_list(ag, ragged['afterglow']['breaks'])
+            get_table_multiple_values(pu, 't_peak')
+            get_table_multiple_values(fl, 'fluence')
+
+    return [
+        ('load/csv', lambda: [read_csv_table(path, t) for t in TABLES]),
+        ('load/parquet', lambda: [load_table(path, t) for t in TABLES]),
+        ('load/ragged', lambda: [load_ragged(path, t, tables[t]) for t in TABLES]),
+        ('lookup/name_index', lambda: build_dataset_index(tables)),
+        ('lookup/search_index', lambda: build_search_index(tables)),
+        ('lookup/rows', burst_rows),
+        ('lookup/resolve', lambda: [search_index.resolve(n) for n in names]),
+        ('lookup/query', lambda: [search_index.query(q) for q in queries]),
+        ('format/burst_tables', formatting),
+        ('features/afterglow', lambda: afterglow_features(tables['afterglow'], ragged['afterglow']['fluence'], PARAM_SETTINGS)),
+        ('features/components', lambda: (component_features(tables['flares'], 'flarenum', PARAM_SETTINGS),
+                                         component_features(tables['pulses'], 'pulse_num', PARAM_SETTINGS))),
+        ('features/population', lambda: ComponentPopulation(flares, pulses)),
+        ('query/filter', lambda: query(path, 'flares', 'e_iso > 1e52 and flare_count >= 2')),
+        # the undecorated builders, so Streamlit's figure cache doesn't hide the cost
+        ('figure/afterglow', lambda: afterglow_figure.__wrapped__(path, afterglow, AFTERGLOW_AXES, PARAM_SETTINGS, 'T90', 'Afterglow Fluence',
+                                                                  'Log-scale', 'Log-scale', 'Break Count', (), 'Auto')),
+        ('figure/components', lambda: flares_figure.__wrapped__(path, population, COMPONENT_AXES, PARAM_SETTINGS, 'Isotropic Energy',
+                                                                'Peak Luminosity', 'Log-scale', 'Log-scale', 'None', (), True, True, 'Auto')),
+        ('figure/density', lambda: density_figure.__wrapped__(path, 'Flares+Pulses', population.rows(population.mask(['Flares', 'Pulses'])),
+                                                              COMPONENT_AXES, PARAM_SETTINGS, 'Isotropic Energy', 'Peak Luminosity',
+                                                              'Log-scale', 'Log-scale', ())),
+    ]
+
+def run_scale(path, scale, repeat, only=None, seed=0):
+
+    rng = np.random.default_rng(seed)
+    results = []
+
+    start = time.perf_counter()
+    ingest_dataset(path)
+    ingest_time = time.perf_counter() - start
+
+    rows = {t: len(load_table(path, t, ['GRBname'])) for t in TABLES}
+    results.append(result('ingest', scale, rows, [ingest_time]))
+
+    for name, fn in benchmarks(path, rng):
+        if only and not any(name.startswith(o) for o in only):
+            continue
+        results.append(result(name, scale, rows, timed(fn, repeat)))
+        print(f"  {name:<22} {statistics.median(results[-1]['times']) * 1e3:10.2f} ms", file=sys.stderr)
+
+    return results
+
+def result(name, scale, rows, times):
+    return {
+        'name': name,
+        'scale': scale,
+        'rows': rows,
+        'repeat': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'max': max(times),
+        'times': times,
+    }
+
+def environment():
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    from functions.catalogue import list_datasets, dataset_path
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run',
+                                     description="Time data loading, burst lookup, formatting, features and figures on synthetic catalogues.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', default=None, help="benchmark name prefixes to run, e.g. lookup figure/afterglow")
+    parser.add_argument('--source', default=None, help="dataset the synthetic catalogues are copied from (default: newest in results/)")
+    parser.add_argument('--data-dir', default=None, help="where to keep the synthetic datasets (default: a temporary folder)")
+    parser.add_argument('--output', default='bench_results.json', help="JSON results file, '-' for stdout")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    source = args.source or dataset_path(list_datasets()[0])
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='laff_bench_')
+    report = {'environment': environment(), 'source': source, 'results': []}
+
+    try:
+        for scale in args.scales:
+            path = os.path.join(data_dir, f'x{scale}')
+            if not os.path.exists(os.path.join(path, 'pulses.csv')):
+                write_synthetic(source, path, scale)
+
+            print(f"x{scale}", file=sys.stderr)
+            report['results'] += run_scale(path, scale, args.repeat, args.only)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=1)
+
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+        print(f"wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from functions.ingest import TABLES, TABLE_SCHEMAS, csv_path, read_csv_table
+
+###############################################################################
+### SYNTHETIC CATALOGUE
+
+SCALES = (1, 10, 100)
+NOISE = 0.05 # relative scatter applied to numeric values of the copies
+
+# values that identify a fit or count rows rather than measure something
+FIXED_COLUMNS = {'GRBname', 'Trig_ID', 'breaknum', 'flarenum', 'pulse_num', 'n', 'npar', 'dof',
+                 'flare_count', 'pulse_count', 'dimple'}
+
+
+def copy_suffix(copy):
+    """Letters appended to the names of the `copy`th copy, e.g. 1 -> "XB", 27 -> "XBB"."""
+
+    letters = ''
+    while copy:
+        copy, rem = divmod(copy, 26)
+        letters = chr(ord('A') + rem) + letters
+    return 'X' + letters
+
+def synthesize_table(df, table, scale, rng):
+    """`scale` copies of a table: renamed bursts, shifted trigger IDs, scattered measurements.
+
+    Copy 0 is the original. Every table is copied the same way, so a burst's
+    afterglow, flares and pulses stay together and the per-burst counts stay valid.
+    """
+
+    schema = TABLE_SCHEMAS[table]
+    numeric = [c for c in df.columns if schema.get(c, '').startswith('float') and c not in FIXED_COLUMNS]
+    copies = [df]
+
+    for copy in range(1, scale):
+        out = df.copy()
+        out['GRBname'] = out['GRBname'].astype(str) + copy_suffix(copy)
+        out['Trig_ID'] = out['Trig_ID'] + copy * 10_000_000
+
+        scatter = rng.lognormal(0, NOISE, size=(len(out), len(numeric)))
+        out[numeric] = out[numeric].to_numpy() * scatter
+
+        copies.append(out)
+
+    return pd.concat(copies, ignore_index=True)
+
+def write_synthetic(source, out_dir, scale, seed=0):
+    """Write a synthetic dataset `scale` times the size of `source` into `out_dir`."""
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    rows = {}
+
+    for table in TABLES:
+        df = read_csv_table(source, table)
+        original_columns = list(pd.read_csv(csv_path(source, table), nrows=0).columns)
+
+        synthetic = synthesize_table(df, table, scale, rng)
+        synthetic[original_columns].to_csv(csv_path(out_dir, table), index=False)
+        rows[table] = len(synthetic)
+
+    return rows
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    from functions.catalogue import list_datasets, dataset_path
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.synthetic',
+                                     description="Write schema-faithful synthetic LAFF results at a multiple of the real catalogue size.")
+    parser.add_argument('out_dir', help="folder to write afterglow.csv, flares.csv and pulses.csv into")
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--source', default=None, help="dataset to copy (default: newest in results/)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    rows = write_synthetic(args.source or dataset_path(list_datasets()[0]), args.out_dir, args.scale, args.seed)
+    print(f"{args.out_dir}: " + ", ".join(f"{n} {table}" for table, n in rows.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse, FileResponse
+from starlette.routing import Route
+
+from functions.ingest import TABLES, csv_path
+from functions.catalogue import list_datasets, dataset_path, get_dataset
+from functions.manifest import read_manifest, manifest_path
+from functions.bursts import burst_summary, burst_overview, widen_floats
+from functions.query import query, QueryError
+from functions.export import EXPORT_FORMATS, iter_table, exports
+from functions.images import MIME_TYPES, figure_file
+
+###############################################################################
+### HTTP API
+
+API_VERSION = 1
+MAX_AGE = 60 # seconds clients may reuse a response before revalidating
+FIGURE_MAX_AGE = 24 * 3600 # figures only change when a dataset is re-rendered
+RESPONSE_CACHE_SIZE = 512
+
+
+class _ResponseCache:
+    """Rendered response bodies, least recently used first out."""
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        return None
+
+    def put(self, key, value):
+        with self.lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+_responses = _ResponseCache()
+
+
+class APIError(Exception):
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **extra}
+
+
+def resolve_folder(request):
+    """Dataset folder from the `dataset` query parameter, defaulting to the newest."""
+
+    datasets = list_datasets()
+    folder = request.query_params.get('dataset', datasets[0] if datasets else None)
+
+    if folder not in datasets:
+        raise APIError(404, f"unknown dataset '{folder}'", datasets=datasets)
+
+    return folder
+
+def last_modified(path):
+    """Time the dataset was last written: its manifest, or the newest CSV without one."""
+
+    files = [manifest_path(path)] if read_manifest(path) is not None else [csv_path(path, t) for t in TABLES]
+    return max((os.path.getmtime(f) for f in files if os.path.exists(f)), default=0)
+
+def _json(body):
+    return json.dumps(body, separators=(',', ':'), allow_nan=False).encode()
+
+def cached(handler):
+    """Wrap an endpoint with conditional GET handling and a server-side response cache.
+
+    ETags combine the dataset's content key with the request URL, so they change
+    exactly when the data (or the request) does.
+    """
+
+    def endpoint(request):
+
+        try:
+            folder = resolve_folder(request)
+            dataset = get_dataset(folder)
+
+            url = request.url.path + '?' + '&'.join(sorted(f'{k}={v}' for k, v in request.query_params.multi_items()))
+            etag = '"' + hashlib.sha1(f'{API_VERSION}:{dataset.key}:{url}'.encode()).hexdigest() + '"'
+            modified = last_modified(dataset.path)
+
+            headers = {
+                'ETag': etag,
+                'Last-Modified': formatdate(modified, usegmt=True),
+                'Cache-Control': f'public, max-age={MAX_AGE}',
+            }
+
+            if not_modified(request, etag, modified):
+                return Response(status_code=304, headers=headers)
+
+            hit = _responses.get(etag)
+            if hit is not None:
+                body, media_type = hit
+                return Response(body, media_type=media_type, headers=headers)
+
+            result = handler(request, dataset)
+
+            if isinstance(result, StreamingResponse):
+                result.headers.update(headers)
+                return result
+
+            body, media_type = (_json(result), 'application/json') if not isinstance(result, tuple) else result
+            _responses.put(etag, (body, media_type))
+
+            return Response(body, media_type=media_type, headers=headers)
+
+        except APIError as e:
+            return Response(_json(e.body), status_code=e.status, media_type='application/json')
+        except QueryError as e:
+            return Response(_json({'error': str(e)}), status_code=400, media_type='application/json')
+
+    endpoint.__name__ = handler.__name__
+    return endpoint
+
+def not_modified(request, etag, modified):
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag in [t.strip().removeprefix('W/') for t in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+def _int_param(request, key, default=None):
+
+    value = request.query_params.get(key)
+    if value is None:
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        raise APIError(400, f"'{key}' must be an integer") from None
+
+def _columns_param(request):
+    value = request.query_params.get('columns')
+    return [c.strip() for c in value.split(',') if c.strip()] if value else None
+
+
+###############################################################################
+### ENDPOINTS
+
+def datasets(request):
+    """Every dataset with its manifest summary; not cached since it lists folders."""
+
+    body = []
+    for folder in list_datasets():
+        manifest = read_manifest(dataset_path(folder)) or {}
+        body.append({
+            'dataset': folder,
+            'date': manifest.get('date'),
+            'version': manifest.get('version'),
+            'rows': {t: e['rows'] for t, e in manifest.get('tables', {}).items()},
+        })
+
+    return Response(_json(body), media_type='application/json')
+
+@cached
+def burst(request, dataset):
+
+    text = request.path_params['name']
+    name = dataset.search_index.resolve(text)
+
+    if name is None:
+        candidates = dataset.search_index.candidates(text)
+        if candidates:
+            raise APIError(404, f"'{text}' matches several bursts", suggestions=candidates)
+        raise APIError(404, f"no burst matching '{text}'", suggestions=dataset.search_index.query(text, limit=8))
+
+    return burst_summary(dataset, name)
+
+@cached
+def bursts(request, dataset):
+    """Bursts with any row in `table` (default afterglow) matching `filter`, with catalogue values and counts."""
+
+    table = request.query_params.get('table', 'afterglow')
+    where = request.query_params.get('filter')
+
+    overview = burst_overview(dataset)
+
+    if where:
+        names = query(dataset, table, where, columns=['GRBname'])['GRBname'].unique()
+        overview = overview[overview['GRBname'].isin(names)]
+
+    limit = _int_param(request, 'limit')
+    if limit is not None:
+        overview = overview.head(limit)
+
+    return f'{{"count":{len(overview)},"bursts":{overview.to_json(orient="records")}}}'.encode(), 'application/json'
+
+@cached
+def population(request, dataset):
+    """Rows of a table, filtered and projected as in functions.query; JSON, CSV or Parquet."""
+
+    table = request.path_params['table']
+    fmt = request.query_params.get('format', 'json').lower()
+
+    df = query(dataset, table, request.query_params.get('filter'), _columns_param(request),
+               request.query_params.get('sort'), request.query_params.get('desc') in ('1', 'true'),
+               _int_param(request, 'limit'))
+
+    if fmt == 'json':
+        return widen_floats(df).to_json(orient='records').encode(), 'application/json'
+
+    labels = {ext: label for label, (ext, _) in EXPORT_FORMATS.items()}
+    if fmt not in labels:
+        raise APIError(400, f"unknown format '{fmt}'", formats=['json'] + list(labels))
+
+    ext, mime = EXPORT_FORMATS[labels[fmt]]
+
+    return StreamingResponse(iter_table(df, labels[fmt]), media_type=mime,
+                             headers={'Content-Disposition': f'attachment; filename="{table}.{ext}"'})
+
+
+def export(request):
+    """A download registered by the viewer's export panel, streamed as it is generated."""
+
+    item = exports.open(request.path_params['token'])
+
+    if item is None:
+        return Response(_json({'error': "unknown or expired export, reload the page for a new link"}), status_code=404, media_type='application/json')
+
+    filename, mime, chunks = item
+
+    return StreamingResponse(chunks, media_type=mime, headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+def figure(request):
+    """A BAT/XRT figure or one of its renditions, as listed in the viewer's <picture> tags."""
+
+    folder = request.path_params['dataset']
+    path = figure_file(dataset_path(folder), request.path_params['instrument'], request.path_params['file']) \
+        if folder in list_datasets() else None
+
+    if path is None:
+        return Response(_json({'error': "unknown figure"}), status_code=404, media_type='application/json')
+
+    return FileResponse(path, media_type=MIME_TYPES[os.path.splitext(path)[1][1:].lower()],
+                        headers={'Cache-Control': f'public, max-age={FIGURE_MAX_AGE}'})
+
+
+routes = [
+    Route('/datasets', datasets),
+    Route('/bursts', bursts),
+    Route('/bursts/{name}', burst),
+    Route('/populations/{table}', population),
+    Route('/export/{token}', export),
+    Route('/figures/{dataset}/{instrument}/{file}', figure),
+]
+
+app = Starlette(routes=routes)
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog='python -m functions.api',
+                                     description="Serve burst summaries and population tables as JSON over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    uvicorn.run('functions.api:app', host=args.host, port=args.port, workers=args.workers, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
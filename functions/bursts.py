@@ -0,0 +1,122 @@
+import math
+import numpy as np
+import pandas as pd
+
+from functions.name_index import lookup_rows
+from functions.features import converted_fluence
+
+###############################################################################
+### BURST SUMMARIES
+
+FLARE_COLUMNS = ('flarenum', 't_start', 't_peak', 't_end', 'duration', 'underlying_index',
+                 'fluence', 'peak_flux', 'e_iso', 'L_p', 'L_iso')
+FLARE_PARAMS = ('t_peak', 'rise', 'decay', 'sharpness', 'amplitude')
+PULSE_COLUMNS = ('pulse_num', 't_start', 't_peak', 't_stop', 'duration', 't_ratio',
+                 'fluence', 'peak_flux', 'e_iso', 'L_p', 'L_iso', 'rise', 'decay', 'sharp', 'amplitude')
+
+
+def json_value(value):
+    """Plain Python value for JSON output, with NaN/NA as None."""
+
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) else float(value)
+    if value is None or value is pd.NA or (isinstance(value, str) and value == 'nan'):
+        return None
+    return value
+
+def widen_floats(df):
+    """float32 columns as float64 with the same shortest repr, so JSON shows 8.836 rather than 8.836000442504883."""
+
+    columns = df.select_dtypes('float32').columns
+
+    if not len(columns):
+        return df
+
+    return df.assign(**{c: df[c].astype(str).astype('float64') for c in columns})
+
+def json_list(values):
+    return [json_value(v) for v in values]
+
+def _records(df, columns):
+    columns = [c for c in columns if c in df.columns]
+    return [{c: json_value(v) for c, v in zip(columns, row)} for row in df[columns].itertuples(index=False)]
+
+def burst_summary(dataset, name):
+    """Everything the Burst Viewer shows for one burst, as a JSON-ready dict; None if it isn't in the dataset.
+
+    `name` must be the canonical name, e.g. from dataset.search_index.resolve.
+    """
+
+    name_index = dataset.name_index
+    afterglow = widen_floats(lookup_rows(dataset.afterglow, name_index['afterglow'], name))
+    flares = widen_floats(lookup_rows(dataset.flares, name_index['flares'], name))
+    pulses = widen_floats(lookup_rows(dataset.pulses, name_index['pulses'], name))
+
+    if afterglow.empty and flares.empty and pulses.empty:
+        return None
+
+    # catalogue columns are repeated on every table
+    first = next(df for df in (afterglow, pulses, flares) if not df.empty).iloc[0]
+
+    summary = {
+        'name': name,
+        'trigger_id': None if pd.isna(first['Trig_ID']) else int(first['Trig_ID']),
+        'T90': json_value(first['T90']),
+        'T90_err': json_value(first['T90_err']),
+        'redshift': json_value(first['redshift']),
+        'redshift_err': json_value(first['redshift_err']),
+        'pulse_count': len(pulses),
+        'flare_count': None if afterglow.empty else len(flares),
+        'afterglow': None,
+        'flares': [],
+        'pulses': _records(pulses, PULSE_COLUMNS),
+        'total_pulse_fluence': json_value(pulses['fluence'].sum()) if len(pulses) else None,
+        'total_flare_fluence': json_value(flares['fluence'].sum()) if len(flares) else None,
+    }
+
+    if not afterglow.empty:
+        ragged = dataset.ragged('afterglow')
+        row = afterglow.index[0]
+        fluence = converted_fluence(ragged['fluence'].take([row]), afterglow['conversion'])[0]
+
+        summary['afterglow'] = {
+            'breaknum': int(afterglow['breaknum'].iloc[0]),
+            'slopes': json_list(ragged['slopes'][row]),
+            'slopes_err': json_list(ragged['slopes_err'][row]),
+            'breaks': json_list(ragged['breaks'][row]),
+            'breaks_err': json_list(ragged['breaks_err'][row]),
+            'normal': json_value(afterglow['normal'].iloc[0]),
+            'fluence': json_value(fluence) if fluence > 0 else None,
+            'rchisq': json_value(afterglow['rchisq'].iloc[0]),
+        }
+
+    if len(flares):
+        params = dataset.ragged('flares')['params'].take(flares.index)
+        records = _records(flares, FLARE_COLUMNS)
+        for i, record in enumerate(records):
+            record['params'] = dict(zip(FLARE_PARAMS, json_list(params[i])))
+        summary['flares'] = records
+
+    return summary
+
+def burst_overview(dataset):
+    """One row per burst: catalogue values, break count and flare/pulse counts."""
+
+    def build(ds):
+        catalogue = ['GRBname', 'Trig_ID', 'T90', 'redshift']
+        rows = pd.concat([ds.columns(table, catalogue) for table in ('afterglow', 'pulses', 'flares')])
+        overview = rows.drop_duplicates('GRBname').set_index('GRBname').sort_index()
+
+        overview['breaknum'] = ds.columns('afterglow', ['GRBname', 'breaknum']).set_index('GRBname')['breaknum']
+        overview['flare_count'] = ds.columns('flares', ['GRBname'])['GRBname'].value_counts()
+        overview['pulse_count'] = ds.columns('pulses', ['GRBname'])['GRBname'].value_counts()
+
+        overview[['flare_count', 'pulse_count']] = overview[['flare_count', 'pulse_count']].fillna(0).astype('int64')
+        overview['breaknum'] = overview['breaknum'].astype('Int64')
+        overview['Trig_ID'] = overview['Trig_ID'].astype('Int64')
+
+        return widen_floats(overview.reset_index())
+
+    return dataset.derived('burst_overview', build).copy(deep=False)
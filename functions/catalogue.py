@@ -0,0 +1,42 @@
+import os
+
+from functions.dataset_store import get_store
+from functions.manifest import parse_dataset_name, read_manifest
+
+###############################################################################
+### CATALOGUE
+
+RESULTS_DIR = 'results'
+
+def beautify_dataset_name(folder_name, manifest=None):
+    """Sidebar label for a dataset, e.g. "05/2025 (laff v1.0.0)", or None for a malformed folder name."""
+
+    if manifest is not None and manifest.get('date') and manifest.get('version'):
+        date, version = manifest['date'], manifest['version']
+    else:
+        parsed = parse_dataset_name(folder_name)
+        if parsed is None:
+            return None
+        date, version = parsed
+
+    yyyy, mm = date.split('-')
+    return f"{mm}/{yyyy} (laff v{version})"
+
+def list_datasets(results_dir=RESULTS_DIR):
+    """Dataset folders in the results directory, newest first, skipping any that aren't named like a dataset."""
+
+    return [d for d in sorted(os.listdir(results_dir), reverse=True)
+            if os.path.isdir(os.path.join(results_dir, d)) and parse_dataset_name(d) is not None]
+
+def dataset_labels(results_dir=RESULTS_DIR):
+    """{sidebar label: folder} for every dataset, labelled from its manifest where there is one."""
+
+    return {beautify_dataset_name(d, read_manifest(dataset_path(d, results_dir))): d for d in list_datasets(results_dir)}
+
+def dataset_path(folder, results_dir=RESULTS_DIR):
+    return os.path.join(results_dir, folder)
+
+def get_dataset(folder, results_dir=RESULTS_DIR):
+    """Shared dataset for a results folder; tables and indexes load on first access,
+    e.g. `get_dataset(folder).pulses`."""
+    return get_store().get(dataset_path(folder, results_dir))
@@ -0,0 +1,88 @@
+import warnings
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from functions.density import axis_values
+
+###############################################################################
+### CORRELATION MATRIX
+
+CORRELATION_METHODS = {'pearson': "Pearson (log)", 'spearman': "Spearman", 'kendall': "Kendall"}
+MIN_PAIRS = 3 # fewer complete rows than this give NaN coefficients
+RANK_MAX_ROWS = 20_000 # Spearman/Kendall use a fixed random sample of rows above this
+
+# method: scipy.stats test giving the coefficient and its two-sided p-value
+CORRELATION_TESTS = {'pearson': stats.pearsonr, 'spearman': stats.spearmanr, 'kendall': stats.kendalltau}
+
+
+def correlation_values(df, columns, param_settings):
+    """Float matrix of `columns`, log10 where param_settings plots them on log axes; NaN where missing.
+
+    Every method uses these values, so each pair is measured over the same rows as
+    its default log-log plot, and Pearson is computed in log space.
+    """
+
+    return np.column_stack([axis_values(df[c], param_settings.get(c, {}).get('log', False)) for c in columns])
+
+def pairwise_counts(values):
+    valid = np.isfinite(values).astype('float64')
+    return (valid.T @ valid).astype('int64')
+
+def pairwise_test(values, test):
+    """Coefficient and two-sided p-value of a scipy.stats `test` for every column pair, over the rows where both are finite."""
+
+    k = values.shape[1]
+    r, p = np.full((k, k), np.nan), np.full((k, k), np.nan)
+    valid = np.isfinite(values)
+
+    for i, j in zip(*np.triu_indices(k, 1)):
+        both = valid[:, i] & valid[:, j]
+        if both.sum() < MIN_PAIRS:
+            continue
+
+        # a constant column has no defined coefficient: scipy warns and returns NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', stats.ConstantInputWarning)
+            result = test(values[both, i], values[both, j])
+
+        r[i, j], p[i, j] = result.statistic, result.pvalue
+
+    return _symmetric(r), _symmetric(p)
+
+def _symmetric(upper):
+    """Mirror the upper triangle of a matrix into its lower triangle."""
+
+    lower = np.tril_indices(len(upper), -1)
+    upper[lower] = upper.T[lower]
+    return upper
+
+
+###############################################################################
+### ALL PAIRS
+
+def correlations(df, columns, param_settings, seed=0):
+    """Every correlation method over every pair of `columns` in one pass.
+
+    Returns {'n': pairwise counts, method: coefficients, f'{method}_p': p-values}
+    as square DataFrames indexed by column. Spearman and Kendall use a fixed
+    random sample of RANK_MAX_ROWS rows on larger tables; N is always the full count.
+    """
+
+    columns = list(columns)
+    values = correlation_values(df, columns, param_settings)
+    n = pairwise_counts(values)
+
+    ranked = values
+    if len(values) > RANK_MAX_ROWS:
+        rows = np.random.default_rng(seed).choice(len(values), RANK_MAX_ROWS, replace=False)
+        ranked = values[np.sort(rows)]
+
+    result = {'n': n}
+    for method, test in CORRELATION_TESTS.items():
+        result[method], result[f'{method}_p'] = pairwise_test(values if method == 'pearson' else ranked, test)
+
+    for method in CORRELATION_METHODS:
+        np.fill_diagonal(result[method], 1.0)
+
+    return {name: pd.DataFrame(matrix, index=columns, columns=columns) for name, matrix in result.items()}
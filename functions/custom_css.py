@@ -1,5 +1,9 @@
 import streamlit as st
 
+COL_PRIMARY = 'rgba(255, 140, 24, 1)'
+COL_SECONDARY = 'rgba(72, 138, 139, 1)'
+COL_TERTIARTY = 'rgba(63, 81, 181, 1)'
+
 selectbox_dropdown = """
 <style>
 .st-d1 {
@@ -0,0 +1,278 @@
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from functions.ingest import TABLES, RAGGED_COLUMNS, csv_path, load_table, load_ragged, drop_list_columns, count_rows
+from functions.name_index import build_dataset_index, build_search_index, search_index_from_triggers
+from functions.images import load_manifest, available_figures
+from functions.manifest import read_manifest, ensure_manifest
+from functions.timing import span
+
+DEFAULT_BUDGET_MB = 512
+PROJECTION_CACHE_SIZE = 8 # column subsets of unloaded tables kept per dataset
+
+###############################################################################
+### DATASET STORE
+
+def dataset_key(path):
+    """Content key of a dataset: its manifest hash, or the CSV mtimes if it has no fresh manifest."""
+
+    manifest = read_manifest(path)
+
+    if manifest is not None:
+        return manifest['sha256']
+
+    return ':'.join(str(os.path.getmtime(p)) for p in (csv_path(path, t) for t in TABLES) if os.path.exists(p))
+
+def object_nbytes(obj):
+    """Approximate memory held by a table, ragged array or dict of them."""
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, dict):
+        return sum(object_nbytes(v) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sum(object_nbytes(v) for v in obj)
+    if hasattr(obj, 'values') and hasattr(obj, 'offsets'):
+        return obj.values.nbytes + obj.offsets.nbytes
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    return 0
+
+
+class Dataset:
+    """One results folder, with tables and derived objects loaded on first use.
+
+    Everything returned is shared between sessions and must be treated as
+    read-only; tables are handed out as shallow copies, so adding or replacing
+    columns on them is safe. Their stringified list columns are only kept parsed,
+    see `ragged` and `with_list_columns`.
+    """
+
+    def __init__(self, path, store, key=None):
+        self.path = path
+        self.key = key if key is not None else dataset_key(path)
+        self._store = store
+        self._tables = {}
+        self._ragged = {}
+        self._derived = {}
+        self._column_order = {}
+        self._loading = {}
+        self._projections = OrderedDict()
+        self.nbytes = 0
+
+    def _get(self, cache, key, loader):
+        """cache[key], loaded on first use; only callers after the same item wait for its loader."""
+
+        if key in cache:
+            return cache[key]
+
+        with self._store.lock:
+            lock = self._loading.setdefault((id(cache), key), threading.Lock())
+
+        with lock:
+            if key not in cache:
+                with span('dataset.load', item=str(key)):
+                    value = loader()
+
+                with self._store.lock:
+                    cache[key] = value
+                    self.nbytes += object_nbytes(value)
+                    self._loading.pop((id(cache), key), None)
+                    self._store.loaded(self)
+
+        return cache[key]
+
+    def _load_table(self, name):
+
+        df = load_table(self.path, name)
+        self._column_order[name] = list(df.columns)
+        self._get(self._ragged, name, lambda: load_ragged(self.path, name, df))
+
+        return drop_list_columns(df, name)
+
+    def table(self, name):
+        df = self._get(self._tables, name, lambda: self._load_table(name))
+        return df.copy(deep=False)
+
+    def ragged(self, name):
+        """Parsed list columns of a table, {column: RaggedArray}, loaded with the table."""
+        self.table(name)
+        return self._ragged[name]
+
+    def with_list_columns(self, name, df):
+        """Rows of a table (indexed by position, as handed out) with their stringified list columns read back, e.g. for exports."""
+
+        self.table(name)
+        missing = [c for c in RAGGED_COLUMNS[name] if c in self._column_order[name] and c not in df.columns]
+
+        if not missing:
+            return df
+
+        strings = load_table(self.path, name, ['GRBname', *missing])[missing]
+        df = df.join(strings)
+
+        return df[[c for c in self._column_order[name] if c in df.columns] +
+                  [c for c in df.columns if c not in self._column_order[name]]]
+
+    def tables(self):
+        return {name: self.table(name) for name in TABLES}
+
+    def columns(self, name, columns):
+        """Only some columns of a table, read without loading the rest unless it is already loaded.
+
+        Columns can be picked by API clients, so nothing per subset is kept for
+        long: list columns are read back on each call (see `with_list_columns`),
+        and the last PROJECTION_CACHE_SIZE subsets of an unloaded table are reused.
+        """
+
+        columns = list(columns)
+        list_columns = [c for c in columns if c in RAGGED_COLUMNS[name]]
+
+        if list_columns:
+            rest = [c for c in columns if c not in list_columns]
+            return self.with_list_columns(name, self.table(name)[rest])[columns]
+
+        if name in self._tables:
+            return self.table(name)[columns]
+
+        key = (name, tuple(columns))
+
+        with self._store.lock:
+            if key in self._projections:
+                self._projections.move_to_end(key)
+                return self._projections[key].copy(deep=False)
+
+        df = load_table(self.path, name, columns)
+
+        with self._store.lock:
+            if key not in self._projections:
+                self._projections[key] = df
+                self.nbytes += object_nbytes(df)
+                while len(self._projections) > PROJECTION_CACHE_SIZE:
+                    self.nbytes -= object_nbytes(self._projections.popitem(last=False)[1])
+                self._store.loaded(self)
+
+            return self._projections[key].copy(deep=False)
+
+    def row_count(self, name):
+
+        if name in self._tables:
+            return len(self._tables[name])
+
+        manifest = self.manifest
+        if manifest is not None and name in manifest['tables']:
+            return manifest['tables'][name]['rows']
+
+        return self._get(self._derived, ('row_count', name), lambda: count_rows(self.path, name))
+
+    def derived(self, key, builder):
+        """Object built once per dataset by `builder(dataset)`, e.g. an index or feature table."""
+        return self._get(self._derived, key, lambda: builder(self))
+
+    ############################################################
+    ## ACCESSORS
+
+    @property
+    def manifest(self):
+        """Contents of the dataset's manifest.json, or None if it needs regenerating."""
+        return read_manifest(self.path)
+
+    @property
+    def afterglow(self):
+        return self.table('afterglow')
+
+    @property
+    def flares(self):
+        return self.table('flares')
+
+    @property
+    def pulses(self):
+        return self.table('pulses')
+
+    @property
+    def lengths(self):
+        return tuple(self.row_count(name) for name in TABLES)
+
+    @property
+    def name_index(self):
+        return self.derived('name_index', lambda ds: build_dataset_index(ds.tables()))
+
+    @property
+    def search_index(self):
+        """Built from the manifest's burst list, or the name and trigger columns without one, so no table is loaded."""
+        return self.derived('search_index', lambda ds: ds._build_search_index())
+
+    def _build_search_index(self):
+
+        manifest = self.manifest
+
+        if manifest is not None:
+            return search_index_from_triggers(manifest['bursts'])
+
+        return build_search_index({name: self.columns(name, ['GRBname', 'Trig_ID']) for name in TABLES})
+
+    @property
+    def name_options(self):
+        """Burst names as shown in the search box, e.g. "GRB 050525A"."""
+        return self.derived('name_options', lambda ds: [x[0:3] + ' ' + x[3:] for x in ds.search_index.names])
+
+    @property
+    def figure_manifest(self):
+        return self.derived('figure_manifest', lambda ds: load_manifest(ds.path))
+
+    @property
+    def figure_names(self):
+        """{instrument: names of the bursts with a BAT/XRT figure}, so exports don't check each file."""
+        return self.derived('figure_names', lambda ds: available_figures(ds.path, ds.figure_manifest))
+
+
+class DatasetStore:
+    """Process-wide datasets, evicting the least recently used above a memory budget."""
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = budget_mb * 1024 ** 2
+        self.lock = threading.RLock()
+        self._datasets = OrderedDict()
+
+    def get(self, path):
+
+        ensure_manifest(path) # so the search index and row counts never need the component tables
+        key = dataset_key(path)
+
+        with self.lock:
+            # a re-ingested dataset gets a new key, dropping everything loaded from the old files
+            if path not in self._datasets or self._datasets[path].key != key:
+                self._datasets[path] = Dataset(path, self, key)
+            self._datasets.move_to_end(path)
+            return self._datasets[path]
+
+    @property
+    def nbytes(self):
+        return sum(ds.nbytes for ds in self._datasets.values())
+
+    def loaded(self, dataset):
+        """Evict least recently used datasets, never `dataset` itself, until within budget."""
+
+        with self.lock:
+            for path in list(self._datasets):
+                if self.nbytes <= self.budget:
+                    break
+                if self._datasets[path] is not dataset:
+                    del self._datasets[path]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_store():
+
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = DatasetStore(int(os.environ.get('LAFF_STORE_BUDGET_MB', DEFAULT_BUDGET_MB)))
+
+    return _store
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+###############################################################################
+### DENSITY BINNING
+
+DENSITY_BINS = 60 # bins per axis; the density figure's size depends only on this
+
+
+def axis_values(values, log):
+    """Float values of a plotted column, in log10 when `log`; NaN where they can't be plotted."""
+
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    if log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(values > 0, np.log10(values), np.nan)
+
+    return values
+
+def bin_edges(values, log, bins=DENSITY_BINS):
+    """Evenly spaced edges over the finite `values`, in log10 space for log axes.
+
+    Integer-valued linear axes with fewer distinct values than bins (e.g. counts)
+    get one bin per integer, so no bins fall empty between them.
+    """
+
+    if not len(values):
+        return np.linspace(0, 1, bins + 1)
+
+    lo, hi = values.min(), values.max()
+
+    if not log and np.all(values == np.round(values)) and hi - lo < bins:
+        return np.arange(lo - 0.5, hi + 1.5)
+
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+
+    return np.linspace(lo, hi, bins + 1)
+
+def density_grid(x, y, x_log, y_log, bins=DENSITY_BINS):
+    """2D histogram of the points with both coordinates finite, plus its marginal histograms.
+
+    `x` and `y` come from axis_values. Returns (counts, x_edges, y_edges), with
+    counts indexed [y bin, x bin] as plotly heatmaps expect; the marginals are
+    counts.sum(axis=0) and counts.sum(axis=1).
+    """
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+
+    x_edges, y_edges = bin_edges(x, x_log, bins), bin_edges(y, y_log, bins)
+    counts, _, _ = np.histogram2d(x, y, bins=(x_edges, y_edges))
+
+    return counts.T.astype('int64'), x_edges, y_edges
+
+def log_ticks(edges):
+    """Tick positions and labels for a log10 axis drawn on a linear scale: 10^n at every integer n."""
+
+    values = np.arange(np.ceil(edges[0]), np.floor(edges[-1]) + 1).astype(int)
+    return values.tolist(), [f"10<sup>{v}</sup>" for v in values]
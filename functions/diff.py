@@ -0,0 +1,242 @@
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from functions.ingest import TABLES, RAGGED_COLUMNS
+from functions.ragged import RaggedArray
+
+###############################################################################
+### RELEASE DIFF
+
+# columns identifying the same row across releases
+KEY_COLUMNS = {
+    'afterglow': ('GRBname',),
+    'flares': ('GRBname', 'flarenum'),
+    'pulses': ('GRBname', 'pulse_num'),
+}
+
+STATUSES = ('added', 'removed', 'changed', 'unchanged')
+
+# relative tolerance below which numeric values count as unchanged, so that
+# re-running the same fit doesn't show up as a change from float round-off
+DEFAULT_RTOL = 1e-6
+
+def values_differ(old, new, rtol=DEFAULT_RTOL):
+    """Elementwise True where two aligned columns differ, treating NaN == NaN."""
+
+    if pd.api.types.is_numeric_dtype(old) and pd.api.types.is_numeric_dtype(new):
+        old = old.to_numpy(dtype='float64', na_value=np.nan)
+        new = new.to_numpy(dtype='float64', na_value=np.nan)
+        return ~np.isclose(old, new, rtol=rtol, atol=0, equal_nan=True)
+
+    both_missing = (old.isna() & new.isna()).to_numpy()
+    return (old.astype(str).to_numpy() != new.astype(str).to_numpy()) & ~both_missing
+
+def ragged_differ(old, new, old_rows, new_rows, rtol=DEFAULT_RTOL):
+    """Compare one parsed list column between aligned rows of two releases.
+
+    `old_rows`/`new_rows` are the positions of each aligned row in the ragged
+    arrays, -1 where the row is missing from that release. Returns whether each
+    row differs (a different number of elements, or any element outside `rtol`),
+    the old and new rows as lists, and per-element new - old deltas for rows of
+    equal length (None where the lengths differ).
+    """
+
+    in_both = (old_rows >= 0) & (new_rows >= 0)
+
+    old_lengths = np.append(old.lengths, -1)[old_rows]
+    new_lengths = np.append(new.lengths, -1)[new_rows]
+    same_length = in_both & (old_lengths == new_lengths)
+
+    # equal-length rows line up element for element once flattened
+    rows = np.flatnonzero(same_length)
+    old_same, new_same = old.take(old_rows[rows]), new.take(new_rows[rows])
+    element_differ = ~np.isclose(old_same.values, new_same.values, rtol=rtol, atol=0, equal_nan=True)
+    row_ids = np.repeat(np.arange(len(rows)), old_same.lengths)
+
+    differ = in_both & ~same_length
+    differ[rows] = np.bincount(row_ids, weights=element_differ, minlength=len(rows)) > 0
+
+    deltas = RaggedArray(new_same.values - old_same.values, old_same.offsets)
+
+    return (differ, _lists_at(len(old_rows), np.flatnonzero(old_rows >= 0), old.take(old_rows[old_rows >= 0])),
+            _lists_at(len(new_rows), np.flatnonzero(new_rows >= 0), new.take(new_rows[new_rows >= 0])),
+            _lists_at(len(old_rows), rows, deltas))
+
+def _lists_at(n, rows, ragged):
+    """Object array of length n holding the rows of `ragged` as lists at positions `rows`, None elsewhere."""
+
+    out = np.full(n, None, dtype=object)
+    for row, values in zip(rows, ragged.to_lists()):
+        out[row] = values
+
+    return out
+
+def diff_table(old, new, table, rtol=DEFAULT_RTOL, old_ragged=None, new_ragged=None):
+    """Row-by-row comparison of one table between two releases.
+
+    Returns one row per key with a `status` of added/removed/changed/unchanged,
+    the `changed_columns` of changed rows, and `{col}_old`/`{col}_new` for each
+    shared column plus `{col}_delta` for the numeric ones.
+
+    List columns are compared from the parsed `{column: RaggedArray}` of each
+    table (rows by position, as loaded), element by element: their `_old`/`_new`
+    are lists and `_delta` the per-element differences of rows of equal length.
+    """
+
+    old_ragged, new_ragged = old_ragged or {}, new_ragged or {}
+    list_columns = [c for c in RAGGED_COLUMNS[table] if c in old_ragged and c in new_ragged]
+
+    keys = list(KEY_COLUMNS[table])
+    columns = [c for c in old.columns if c in new.columns and c not in keys and c not in list_columns]
+
+    old = old[keys + columns].assign(_row=np.arange(len(old)))
+    new = new[keys + columns].assign(_row=np.arange(len(new)))
+    merged = old.merge(new, on=keys, how='outer', sort=True,
+                       suffixes=('_old', '_new'), indicator=True, validate='one_to_one')
+
+    in_both = (merged['_merge'] == 'both').to_numpy()
+    differ = np.zeros((len(merged), len(columns) + len(list_columns)), dtype=bool)
+
+    out = {key: merged[key] for key in keys}
+
+    for i, col in enumerate(columns):
+        col_old, col_new = merged[f'{col}_old'], merged[f'{col}_new']
+        differ[:, i] = values_differ(col_old, col_new, rtol) & in_both
+
+        out[f'{col}_old'] = col_old
+        out[f'{col}_new'] = col_new
+        if pd.api.types.is_numeric_dtype(col_old) and pd.api.types.is_numeric_dtype(col_new):
+            out[f'{col}_delta'] = col_new - col_old
+
+    old_rows = merged['_row_old'].fillna(-1).to_numpy(dtype='int64')
+    new_rows = merged['_row_new'].fillna(-1).to_numpy(dtype='int64')
+
+    for i, col in enumerate(list_columns, start=len(columns)):
+        differ[:, i], out[f'{col}_old'], out[f'{col}_new'], out[f'{col}_delta'] = \
+            ragged_differ(old_ragged[col], new_ragged[col], old_rows, new_rows, rtol)
+
+    status = np.select([merged['_merge'] == 'right_only', merged['_merge'] == 'left_only', differ.any(axis=1)],
+                       ['added', 'removed', 'changed'], 'unchanged')
+
+    changed_columns = np.full(len(merged), '', dtype=object)
+    names = np.array(columns + list_columns, dtype=object)
+    for row in np.flatnonzero(differ.any(axis=1)):
+        changed_columns[row] = ', '.join(names[differ[row]])
+
+    result = pd.DataFrame(out)
+    result.insert(len(keys), 'status', pd.Categorical(status, categories=STATUSES))
+    result.insert(len(keys) + 1, 'changed_columns', changed_columns)
+    result.insert(len(keys) + 2, 'n_changed', differ.sum(axis=1))
+
+    return result
+
+def diff_datasets(old_tables, new_tables, rtol=DEFAULT_RTOL, old_ragged=None, new_ragged=None):
+    """diff_table for every table present in both {table: DataFrame} mappings.
+
+    `old_ragged`/`new_ragged` hold the parsed list columns, {table: {column: RaggedArray}}.
+    """
+
+    old_ragged, new_ragged = old_ragged or {}, new_ragged or {}
+
+    return {table: diff_table(old_tables[table], new_tables[table], table, rtol,
+                              old_ragged.get(table), new_ragged.get(table))
+            for table in TABLES if table in old_tables and table in new_tables}
+
+def release_diff(old_dataset, new_dataset, rtol=DEFAULT_RTOL):
+    """diff_datasets between two store datasets, cached on the newer one."""
+
+    key = ('release_diff', old_dataset.key, rtol)
+
+    def build(ds):
+        return diff_datasets(old_dataset.tables(), ds.tables(), rtol,
+                             {t: old_dataset.ragged(t) for t in TABLES}, {t: ds.ragged(t) for t in TABLES})
+
+    return new_dataset.derived(key, build)
+
+
+###############################################################################
+### SUMMARIES
+
+def status_counts(diff):
+    return diff['status'].value_counts().reindex(STATUSES, fill_value=0)
+
+def column_change_counts(diff):
+    """Number of changed rows per column, most changed first."""
+
+    changed = diff.loc[diff['status'] == 'changed', 'changed_columns']
+    counts = changed.str.split(', ').explode().value_counts()
+
+    return counts.rename_axis('column').rename('rows_changed')
+
+def burst_summary(diffs):
+    """One row per burst with its afterglow status and flare/pulse counts in each release."""
+
+    afterglow = diffs['afterglow'].set_index('GRBname')
+    summary = pd.DataFrame({'afterglow': afterglow['status'].astype(str)})
+
+    if 'breaknum_old' in afterglow:
+        summary['breaks_old'] = afterglow['breaknum_old']
+        summary['breaks_new'] = afterglow['breaknum_new']
+
+    for table in ('flares', 'pulses'):
+        if table not in diffs:
+            continue
+
+        counts = pd.crosstab(diffs[table]['GRBname'], diffs[table]['status']).reindex(columns=list(STATUSES), fill_value=0)
+
+        summary = summary.join(pd.DataFrame({
+            f'{table}_old': counts['removed'] + counts['changed'] + counts['unchanged'],
+            f'{table}_new': counts['added'] + counts['changed'] + counts['unchanged'],
+            f'{table}_added': counts['added'],
+            f'{table}_removed': counts['removed'],
+            f'{table}_changed': counts['changed'],
+        }), how='outer')
+
+    count_cols = [c for c in summary.columns if c.startswith(('flares_', 'pulses_'))]
+    summary[count_cols] = summary[count_cols].fillna(0).astype('int64')
+    summary['afterglow'] = summary['afterglow'].fillna('-')
+
+    edited = summary[[c for c in count_cols if c.endswith(('_added', '_removed', '_changed'))]].sum(axis=1) > 0
+    summary['any_change'] = edited | summary['afterglow'].isin(['added', 'removed', 'changed'])
+
+    return summary.rename_axis('GRBname').reset_index()
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    from functions.ingest import load_table, parse_ragged, drop_list_columns
+
+    parser = argparse.ArgumentParser(prog='python -m functions.diff',
+                                     description="Summarise what changed between two LAFF result datasets.")
+    parser.add_argument('old', help="older dataset folder, e.g. results/2505_1.0.0")
+    parser.add_argument('new', help="newer dataset folder")
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL, help="relative tolerance for numeric changes")
+    parser.add_argument('--columns', type=int, default=10, help="number of most-changed columns to list per table")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    old = {t: load_table(args.old, t) for t in TABLES}
+    new = {t: load_table(args.new, t) for t in TABLES}
+
+    diffs = diff_datasets({t: drop_list_columns(df, t) for t, df in old.items()},
+                          {t: drop_list_columns(df, t) for t, df in new.items()}, args.rtol,
+                          {t: parse_ragged(df, t) for t, df in old.items()},
+                          {t: parse_ragged(df, t) for t, df in new.items()})
+
+    for table, diff in diffs.items():
+        counts = status_counts(diff)
+        print(f"{table}: " + ", ".join(f"{counts[s]} {s}" for s in STATUSES))
+
+        for column, n in column_change_counts(diff).head(args.columns).items():
+            print(f"    {column:<24} {n}")
+
+    summary = burst_summary(diffs)
+    print(f"bursts: {int(summary['any_change'].sum())} of {len(summary)} changed")
+
+
+if __name__ == '__main__':
+    main()
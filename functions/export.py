@@ -0,0 +1,188 @@
+import os
+import io
+import time
+import hashlib
+import zipfile
+import threading
+import pandas as pd
+from collections import OrderedDict
+
+from functions.images import INSTRUMENTS, figures_path
+
+###############################################################################
+### EXPORT
+
+# label: (file extension, mime type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+CHUNK_ROWS = 1000
+CHUNK_BYTES = 1 << 20
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream whose writes are collected and drained by a generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return chunks
+
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    """CSV of a table as encoded chunks of `chunk_rows` rows."""
+
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0).encode()
+
+def iter_parquet(df, chunk_rows=CHUNK_ROWS):
+    """Parquet file of a table, written and yielded one row group at a time."""
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(df), chunk_rows):
+            writer.write_table(pa.Table.from_pandas(df.iloc[start:start + chunk_rows], schema=schema, preserve_index=False))
+            yield from sink.drain()
+
+    yield from sink.drain()
+
+def iter_table(df, fmt='CSV'):
+
+    if fmt == 'Parquet':
+        return iter_parquet(df)
+
+    return iter_csv(df)
+
+def figure_files(dataset_path, names, available, instruments=INSTRUMENTS):
+    """(archive name, path) of the original BAT/XRT figures of each burst that has them.
+
+    `available` is {instrument: names with a figure}, from functions.images.available_figures.
+    """
+
+    for instrument in instruments:
+        folder = figures_path(dataset_path, instrument)
+        for name in names:
+            if name in available.get(instrument, ()):
+                yield f"{instrument}/{name}.png", os.path.join(folder, f"{name}.png")
+
+def iter_zip(entries, chunk_size=CHUNK_BYTES):
+    """Zip archive as a stream of chunks, reading each file as it is written.
+
+    `entries` are (archive name, source) pairs, where the source is a file path
+    or an iterable of bytes. Entries are stored uncompressed: PNGs and Parquet
+    are already compressed, and storing keeps the work per chunk trivial.
+    """
+
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for arcname, source in entries:
+
+            if isinstance(source, str):
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                with open(source, 'rb') as src, zf.open(info, 'w', force_zip64=True) as dst:
+                    for chunk in iter(lambda: src.read(chunk_size), b''):
+                        dst.write(chunk)
+                        yield from sink.drain()
+            else:
+                with zf.open(arcname, 'w', force_zip64=True) as dst:
+                    for chunk in source:
+                        dst.write(chunk)
+                        yield from sink.drain()
+
+            yield from sink.drain()
+
+    yield from sink.drain()
+
+
+###############################################################################
+### EXPORT LINKS
+
+EXPORT_TTL = 10 * 60 # seconds a download link stays valid after the page last offered it
+SESSION_EXPORTS = 16 # links kept per session; each holds the table slices it exports, not the files
+
+
+class ExportRegistry:
+    """Downloads offered by the pages, streamed by the /export route of functions.api.
+
+    Streamlit holds a download button's whole payload in memory, so the pages
+    register what a download contains (a generator factory, run only when the link
+    is followed) and link to the route instead. The route is only reachable when
+    functions.api is mounted next to the app (see server.py), which sets `url_prefix`.
+
+    Every rerun registers the links it shows again, so each session keeps its own
+    `size` most recent links: one busy session can't evict another's, and a
+    session's links go once none of them was offered for `ttl` seconds.
+    """
+
+    def __init__(self, ttl=EXPORT_TTL, size=SESSION_EXPORTS):
+        self.ttl = ttl
+        self.size = size
+        self.url_prefix = None
+        self.lock = threading.Lock()
+        self._sessions = {} # session: OrderedDict(token: item), least recently offered first
+        self._tokens = {} # token: session
+
+    @property
+    def enabled(self):
+        return self.url_prefix is not None
+
+    def register(self, session, key, filename, mime, chunks):
+        """URL streaming `chunks()` as `filename`; the same session and key give the same URL on every rerun."""
+
+        token = hashlib.sha256(repr((session, key)).encode()).hexdigest()[:32]
+        now = time.monotonic()
+
+        with self.lock:
+            self._expire(now)
+
+            items = self._sessions.setdefault(session, OrderedDict())
+            items[token] = (now + self.ttl, filename, mime, chunks)
+            items.move_to_end(token)
+            self._tokens[token] = session
+
+            while len(items) > self.size:
+                del self._tokens[items.popitem(last=False)[0]]
+
+        return f"{self.url_prefix}/export/{token}"
+
+    def _expire(self, now):
+        """Drop the sessions whose most recently offered link has expired, e.g. closed tabs."""
+
+        for session in [s for s, items in self._sessions.items() if next(reversed(items.values()))[0] < now]:
+            for token in self._sessions.pop(session):
+                del self._tokens[token]
+
+    def open(self, token):
+        """(filename, mime, chunk iterator) for a registered download, or None if unknown or expired."""
+
+        with self.lock:
+            session = self._tokens.get(token)
+            item = self._sessions[session].get(token) if session is not None else None
+            if item is None or item[0] < time.monotonic():
+                return None
+
+        _, filename, mime, chunks = item
+        return filename, mime, chunks()
+
+exports = ExportRegistry()
+
+def content_key(df):
+    """Cheap fingerprint of a table slice's rows, for export keys."""
+    return len(df), hashlib.sha256(pd.util.hash_pandas_object(df.index, index=False).to_numpy().tobytes()).hexdigest()
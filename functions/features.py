@@ -0,0 +1,147 @@
+import json
+import numpy as np
+import pandas as pd
+
+###############################################################################
+### DERIVED FEATURES
+
+# bump whenever the derived columns below change, to invalidate cached features
+FEATURES_VERSION = 1
+
+# units and axis scaling of the parameters plotted on the Population Statistics page
+PARAM_SETTINGS = {
+    # GENERAL
+    'T90': {'units': 's', 'log': True},
+    'redshift': {'log': False},
+    'dimple': {},
+
+    # FLARE SPECIFIC
+    'fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
+    'duration': {'units': 's', 'log': True},
+    't_peak': {'units': 's', 'log': True},
+    't_ratio': {},
+    'underlying_index': {},
+    
+    'peak_flux': {'units': 'erg\u2009cm<sup>-2</sup>\u2009s<sup>-1</sup>', 'log': True},
+    'e_iso': {'units': 'erg', 'log': True},
+    'L_p': {'units': 'erg\u2009s<sup>-1</sup>', 'log': True},
+    'L_iso': {'units': 'erg\u2009s<sup>-1</sup>', 'log': True},
+    
+    # AFTERGLOW SPECIFIC
+    'afterglow_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
+    'total_flare_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
+    'total_pulse_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
+    
+}
+
+def settings_key(param_settings):
+    """Stable string form of PARAM_SETTINGS, used as part of the feature cache key."""
+    return json.dumps(param_settings, sort_keys=True)
+
+def log_column(values):
+    """log10 of a numeric column, with zeros mapped to NaN."""
+    return np.log10(values.replace(0, np.nan))
+
+def converted_fluence(fluence, conversion):
+    """Afterglow fluence in erg/cm^2: the total count fluence (first element of the ragged fluence) times the flux conversion."""
+    return fluence.column(0) * np.asarray(conversion, dtype='float64')
+
+def add_log_columns(df, param_settings):
+
+    for param, settings in param_settings.items():
+        if settings.get('log') == True and param in df.columns and pd.api.types.is_numeric_dtype(df[param]):
+            df[f'{param}_log'] = log_column(df[param])
+
+    return df
+
+def afterglow_features(tab_afterglow, fluence, param_settings):
+    """Afterglow table with the columns plotted on the Population Statistics page."""
+
+    data = tab_afterglow.copy(deep=False)
+
+    data['afterglow_fluence'] = converted_fluence(fluence, data['conversion'])
+
+    data['dimple'] = pd.to_numeric(data['dimple'], errors='coerce').astype('Int64').astype('str')
+    data['breaknum'] = data['breaknum'].astype(str)
+
+    return add_log_columns(data, param_settings)
+
+def component_features(tab_component, number_col, param_settings):
+    """Flare or pulse table with the columns plotted on the Population Statistics page."""
+
+    data = tab_component.copy(deep=False)
+
+    data['dimple'] = pd.to_numeric(data['dimple'], errors='coerce').astype('Int64').astype(str)
+    data['Pulse/Flare Number'] = data[number_col]
+    data['underlying_index'] = data['underlying_index'].replace("False", np.nan).astype(float)
+
+    return add_log_columns(data, param_settings)
+
+
+###############################################################################
+### COMBINED FLARE/PULSE POPULATION
+
+COMPONENT_TYPES = ('Flares', 'Pulses')
+
+
+class ComponentPopulation:
+    """Flares and pulses in one table, built once per dataset for the Pulses/Flares plot.
+
+    Only the plottable columns are kept: `GRBname`, `Type` and `dimple` as
+    categoricals, the numeric columns with their `_log` columns, and `row`, the
+    row's label in its own feature table. Per-column validity (not missing) and
+    positivity masks are precomputed, so choosing which rows to plot is a few
+    boolean ANDs rather than a concat and copy.
+    """
+
+    def __init__(self, flare_data, pulse_data):
+
+        parts = []
+        for kind, df in zip(COMPONENT_TYPES, (flare_data, pulse_data)):
+            columns = ['GRBname', 'Pulse/Flare Number', 'dimple'] + [c for c in df.columns if c != 'Pulse/Flare Number' and pd.api.types.is_numeric_dtype(df[c])]
+            part = df[list(dict.fromkeys(columns))]
+            parts.append(part.assign(Type=kind, row=df.index))
+
+        data = pd.concat(parts, ignore_index=True)
+
+        data['Type'] = pd.Categorical(data['Type'], categories=COMPONENT_TYPES)
+        data['GRBname'] = data['GRBname'].astype('category')
+        data['dimple'] = data['dimple'].replace('<NA>', np.nan).astype('category')
+
+        self.data = data
+        self.types = {kind: (data['Type'] == kind).to_numpy() for kind in COMPONENT_TYPES}
+        self.valid = {c: data[c].notna().to_numpy() for c in data.columns}
+        self.positive = {c: (data[c] > 0).fillna(False).to_numpy(dtype=bool) for c in data.columns if pd.api.types.is_numeric_dtype(data[c])}
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        masks = sum(m.nbytes for group in (self.types, self.valid, self.positive) for m in group.values())
+        return int(self.data.memory_usage(deep=True).sum()) + masks
+
+    def mask(self, types, columns=(), log_columns=()):
+        """Rows of the given types with every one of `columns` present and every one of `log_columns` positive."""
+
+        mask = np.zeros(len(self.data), dtype=bool)
+        for kind in types:
+            mask |= self.types[kind]
+
+        for col in columns:
+            mask &= self.valid[col]
+        for col in log_columns:
+            if col in self.positive:
+                mask &= self.positive[col]
+
+        return mask
+
+    def rows(self, mask, columns=None):
+        """The masked rows, projected to `columns` first so only those are copied."""
+
+        data = self.data if columns is None else self.data[list(dict.fromkeys(columns))]
+        return data[mask]
+
+    def labels(self, mask, kind):
+        """Labels of the masked rows of one type in its own feature table, e.g. for exporting them."""
+        return self.data['row'].to_numpy()[mask & self.types[kind]]
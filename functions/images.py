@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import base64
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+###############################################################################
+### FIGURE RENDITIONS
+
+INSTRUMENTS = ('bat', 'xrt')
+RENDITION_WIDTHS = (320, 800) # plus one rendition at the source width
+RENDITION_DIR = 'renditions'
+MANIFEST_NAME = 'manifest.json'
+
+# options passed to PIL's Image.save; plots have flat colours, so lossless
+# WebP is smallest at full size while lossy compresses the resampled ones better
+FORMAT_OPTIONS = {
+    'webp': {'full': dict(lossless=True, method=4), 'resized': dict(quality=85, method=4)},
+    'avif': {'full': dict(quality=80), 'resized': dict(quality=70)},
+}
+MIME_TYPES = {'webp': 'image/webp', 'avif': 'image/avif', 'png': 'image/png'}
+
+# <source> order of the <picture> tags: browsers use the first format they support
+PREFERRED_FORMATS = ('avif', 'webp')
+# the viewer shows figures in a 0.6 column of the wide layout, full width on phones
+DISPLAY_SIZES = "(max-width: 640px) 100vw, 55vw"
+# rendition inlined when no figure route is mounted: a data URI has no fallback, so no AVIF
+INLINE_FORMATS = ('webp',)
+INLINE_WIDTH = 800
+
+# where functions.api's /figures route is mounted (see server.py); None inlines the images
+url_prefix = None
+
+
+def figures_path(dataset_path, instrument):
+    return os.path.join(dataset_path, 'figures', instrument)
+
+def renditions_path(dataset_path):
+    return os.path.join(dataset_path, 'figures', RENDITION_DIR)
+
+def manifest_path(dataset_path):
+    return os.path.join(renditions_path(dataset_path), MANIFEST_NAME)
+
+
+def render_figure(source, out_dir, formats=('webp',)):
+    """Write the renditions of one PNG figure and return its manifest entry."""
+
+    from PIL import Image
+
+    name = os.path.splitext(os.path.basename(source))[0]
+
+    with Image.open(source) as im:
+        im.load()
+        if im.mode == 'P': # palette images can't be resampled with LANCZOS
+            im = im.convert('RGBA')
+        width, height = im.size
+
+        widths = sorted({w for w in RENDITION_WIDTHS if w < width} | {width})
+        renditions = []
+
+        for w in widths:
+            resized = im if w == width else im.resize((w, round(height * w / width)), Image.LANCZOS)
+
+            for fmt in formats:
+                filename = f"{name}_{w}.{fmt}"
+                options = FORMAT_OPTIONS[fmt]['full' if w == width else 'resized']
+                resized.save(os.path.join(out_dir, filename), fmt.upper(), **options)
+
+                renditions.append({
+                    'file': filename,
+                    'format': fmt,
+                    'width': w,
+                    'bytes': os.path.getsize(os.path.join(out_dir, filename)),
+                })
+
+    return name, {
+        'source': os.path.basename(source),
+        'width': width,
+        'height': height,
+        'bytes': os.path.getsize(source),
+        'renditions': renditions,
+    }
+
+def build_renditions(dataset_path, formats=('webp',), workers=None):
+    """Render every BAT/XRT figure of a dataset and write the renditions manifest."""
+
+    manifest = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for instrument in INSTRUMENTS:
+            source_dir = figures_path(dataset_path, instrument)
+            if not os.path.isdir(source_dir):
+                continue
+
+            out_dir = os.path.join(renditions_path(dataset_path), instrument)
+            os.makedirs(out_dir, exist_ok=True)
+
+            sources = sorted(os.path.join(source_dir, f) for f in os.listdir(source_dir) if f.endswith('.png'))
+            jobs = [pool.submit(render_figure, source, out_dir, formats) for source in sources]
+
+            manifest[instrument] = dict(job.result() for job in jobs)
+
+    with open(manifest_path(dataset_path), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+    return manifest
+
+
+###############################################################################
+### LOOKUP
+
+def load_manifest(dataset_path):
+    """Renditions manifest of a dataset, or an empty one if it hasn't been built."""
+
+    try:
+        with open(manifest_path(dataset_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def available_figures(dataset_path, manifest):
+    """{instrument: names of the bursts with a figure}, from the renditions manifest or one directory listing."""
+
+    figures = {}
+
+    for instrument in INSTRUMENTS:
+        folder = figures_path(dataset_path, instrument)
+
+        if instrument in manifest:
+            figures[instrument] = frozenset(manifest[instrument])
+        elif os.path.isdir(folder):
+            figures[instrument] = frozenset(f[:-4] for f in os.listdir(folder) if f.endswith('.png'))
+        else:
+            figures[instrument] = frozenset()
+
+    return figures
+
+def figure_path(manifest, dataset_path, instrument, name, formats=PREFERRED_FORMATS, max_width=None):
+    """Path of the widest rendition in the first of `formats` that has one, at most `max_width` wide if given.
+
+    Falls back to the original PNG; returns None if the burst has no figure for
+    this instrument.
+    """
+
+    entry = manifest.get(instrument, {}).get(name)
+
+    for fmt in formats if entry else ():
+        candidates = sorted((r for r in entry['renditions'] if r['format'] == fmt), key=lambda r: r['width'])
+        if candidates:
+            fitting = [r for r in candidates if max_width is None or r['width'] <= max_width] or candidates[:1]
+            return os.path.join(renditions_path(dataset_path), instrument, fitting[-1]['file'])
+
+    png_path = os.path.join(figures_path(dataset_path, instrument), f"{name}.png")
+
+    return png_path if os.path.exists(png_path) else None
+
+def figure_file(dataset_path, instrument, filename):
+    """Path of a rendition or original figure by file name, or None; for the API's /figures route."""
+
+    if instrument not in INSTRUMENTS or os.path.basename(filename) != filename or \
+            os.path.splitext(filename)[1][1:].lower() not in MIME_TYPES:
+        return None
+
+    for folder in (os.path.join(renditions_path(dataset_path), instrument), figures_path(dataset_path, instrument)):
+        path = os.path.join(folder, filename)
+        if os.path.isfile(path):
+            return path
+
+    return None
+
+def figure_url(dataset_path, instrument, filename):
+    return f"{url_prefix}/figures/{os.path.basename(os.path.normpath(dataset_path))}/{instrument}/{filename}"
+
+def figure_html(manifest, dataset_path, instrument, name, alt=''):
+    """A <picture> tag for a burst's figure, or None if it has none.
+
+    With the figure route mounted, every rendition is listed in srcset/sizes so
+    the browser fetches the format and width it needs, and caches it. Otherwise
+    the INLINE_WIDTH WebP rendition is inlined as a data URI. st.image isn't used: it
+    re-encodes WebP as JPEG, turning a 13 KB lossless WebP into a 66 KB JPEG.
+    """
+
+    if url_prefix is None:
+        path = figure_path(manifest, dataset_path, instrument, name, INLINE_FORMATS, INLINE_WIDTH)
+        return image_html(path, alt) if path else None
+
+    entry = manifest.get(instrument, {}).get(name)
+    img = 'style="width: 100%; height: auto;"'
+
+    if not entry:
+        path = figure_path(manifest, dataset_path, instrument, name)
+        return f'<img src="{figure_url(dataset_path, instrument, os.path.basename(path))}" alt="{alt}" {img}>' if path else None
+
+    sources = {}
+    for r in sorted(entry['renditions'], key=lambda r: r['width']):
+        sources.setdefault(r['format'], []).append(f"{figure_url(dataset_path, instrument, r['file'])} {r['width']}w")
+
+    formats = [f for f in PREFERRED_FORMATS if f in sources]
+    fallback = sources[formats[-1]]
+
+    html = ''.join(f'<source type="{MIME_TYPES[f]}" srcset="{", ".join(sources[f])}" sizes="{DISPLAY_SIZES}">' for f in formats[:-1])
+    html += (f'<img src="{fallback[-1].rsplit(" ", 1)[0]}" srcset="{", ".join(fallback)}" sizes="{DISPLAY_SIZES}" '
+             f'width="{entry["width"]}" height="{entry["height"]}" alt="{alt}" {img}>')
+
+    return f'<picture>{html}</picture>'
+
+def image_html(path, alt=''):
+    """An <img> tag with the file's bytes inlined as a data URI."""
+
+    mime = MIME_TYPES[os.path.splitext(path)[1][1:].lower()]
+
+    with open(path, 'rb') as f:
+        data = base64.b64encode(f.read()).decode('ascii')
+
+    return f'<img src="data:{mime};base64,{data}" alt="{alt}" style="width: 100%; height: auto;">'
+
+
+###############################################################################
+### CLI
+
+def main(argv=None):
+
+    from functions.ingest import find_datasets
+
+    parser = argparse.ArgumentParser(prog='python -m functions.images',
+                                     description="Build compressed renditions and thumbnails of the BAT/XRT figures.")
+    parser.add_argument('datasets', nargs='*', help="dataset folders (default: every folder in results/)")
+    parser.add_argument('--avif', action='store_true', help="also write AVIF renditions")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    formats = ('webp', 'avif') if args.avif else ('webp',)
+
+    for dataset_path in args.datasets or find_datasets():
+        manifest = build_renditions(dataset_path, formats, args.workers)
+
+        for instrument, entries in manifest.items():
+            source_bytes = sum(e['bytes'] for e in entries.values())
+            webp_bytes = sum(max(r['bytes'] for r in e['renditions'] if r['format'] == 'webp') for e in entries.values())
+            print(f"{dataset_path} {instrument}: {len(entries)} figures, "
+                  f"{source_bytes / 1e6:.1f} MB png -> {webp_bytes / 1e6:.1f} MB full-size webp")
+
+
+if __name__ == '__main__':
+    main()
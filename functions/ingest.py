@@ -0,0 +1,280 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from functions.ragged import RaggedArray
+from functions.name_index import upper_names
+from functions.timing import timed
+
+try:
+    import pyarrow.parquet as pq
+except ImportError: # CSV only
+    pq = None
+
+###############################################################################
+### TABLE SCHEMAS
+
+TABLES = ('afterglow', 'flares', 'pulses')
+
+# Dtypes are chosen to keep resident tables small: names as categoricals, counts as
+# small nullable ints, and float32 (~7 significant figures, up to ~3e38) for values
+# that are only plotted or displayed to 3 figures. Energies and luminosities reach
+# 1e53 and stay float64, as do the fit normalisations, fluences and conversion
+# factors that are multiplied or summed into other values. A float32 column holds
+# the nearest float32 to each CSV value, so queries round their literals the same
+# way (see functions.query) for "T90 == 8.836" to match.
+
+# columns shared by every table, added by the LAFF catalogue cross-match
+CATALOGUE_COLUMNS = {
+    'Trig_ID': 'Int32', 'T90': 'float32', 'T90_err': 'float32',
+    'redshift': 'float32', 'redshift_err': 'str',
+    'conversion': 'float64', 'conversion_bat': 'float64', 'bat_conversion_rchisq': 'float32',
+    'dimple': 'Int8',
+}
+
+# columns shared by the flare and pulse tables
+COMPONENT_COLUMNS = {
+    't_rise': 'float32', 'duration': 'float32', 't_decay': 'float32',
+    't_start': 'float32', 't_peak': 'float32', 't_ratio': 'float32',
+    'fluence': 'float64', 'fluence_rise': 'float32', 'fluence_decay': 'float32', 'peak_flux': 'float32',
+    'd_l': 'float32', 'e_iso': 'float64', 'L_p': 'float64', 'L_iso': 'float64',
+    't_peak_z': 'float32', 't_start_z': 'float32', 't_end_z': 'float32',
+    'afterglow_fluence': 'float32',
+}
+
+TABLE_SCHEMAS = {
+    'afterglow': {
+        'GRBname': 'category', 'breaknum': 'Int8',
+        'slopes': 'str', 'slopes_err': 'str', 'breaks': 'str', 'breaks_err': 'str',
+        'normal': 'float64', 'normal_err': 'float32', 'fluence': 'str',
+        'chisq': 'float32', 'rchisq': 'float32', 'n': 'Int32', 'npar': 'Int8', 'dof': 'Int32',
+        'deltaAIC': 'float32', 'BIC': 'float32',
+        'flare_count': 'Int16', 'pulse_count': 'Int16',
+        'total_flare_fluence': 'float64', 'total_pulse_fluence': 'float64',
+        **CATALOGUE_COLUMNS,
+    },
+    'flares': {
+        'GRBname': 'category', 'flarenum': 'Int16',
+        'indices': 'str', 'params': 'str', 'errors': 'str', 'stats': 'str',
+        't_end': 'float32', 'underlying_index': 'float32',
+        **CATALOGUE_COLUMNS,
+        **COMPONENT_COLUMNS,
+    },
+    'pulses': {
+        'GRBname': 'category', 'pulse_num': 'Int16',
+        't_stop': 'float32', 'rise': 'float32', 'decay': 'float32', 'sharp': 'float32', 'amplitude': 'float64',
+        'chisq': 'float32', 'rchisq': 'float32', 'deltaAIC': 'float32', 'BIC': 'float32',
+        'underlying_index': 'float32',
+        **CATALOGUE_COLUMNS,
+        **COMPONENT_COLUMNS,
+    },
+}
+
+# placeholder strings read as missing values
+NA_SENTINELS = {
+    'pulses': {'underlying_index': ['False']}, # where no afterglow was fitted
+}
+
+TEXT_DTYPES = ('str', 'category')
+
+def is_numeric_column(table, column):
+    return TABLE_SCHEMAS[table][column] not in TEXT_DTYPES
+
+# stringified list/tuple columns, pre-parsed into ragged arrays
+RAGGED_COLUMNS = {
+    'afterglow': ('slopes', 'slopes_err', 'breaks', 'breaks_err', 'fluence'),
+    'flares': ('indices', 'params', 'errors', 'stats'),
+    'pulses': (),
+}
+
+
+###############################################################################
+### LOADING
+
+def csv_path(dataset_path, table):
+    return os.path.join(dataset_path, f"{table}.csv")
+
+def cache_path(dataset_path, table):
+    return os.path.join(dataset_path, f"{table}.parquet")
+
+def ragged_cache_path(dataset_path, table):
+    return os.path.join(dataset_path, f"{table}_ragged.npz")
+
+def sort_by_name(df):
+    """Stable sort by GRBname, so each burst occupies one contiguous block of rows."""
+
+    names = pd.Index(upper_names(df['GRBname']))
+
+    if names.is_monotonic_increasing:
+        return df
+
+    return df.iloc[names.argsort(kind='stable')].reset_index(drop=True)
+
+@timed('read_csv')
+def read_csv_table(dataset_path, table, columns=None):
+
+    path = csv_path(dataset_path, table)
+    columns = columns or pd.read_csv(path, nrows=0).columns
+    schema = TABLE_SCHEMAS[table]
+
+    df = pd.read_csv(path, usecols=columns, dtype={c: schema[c] for c in columns if c in schema},
+                     na_values=NA_SENTINELS.get(table))[list(columns)]
+
+    return sort_by_name(df)
+
+def apply_schema(df, table):
+    """Cast columns to the table schema, e.g. for a Parquet cache written with older dtypes."""
+
+    schema = TABLE_SCHEMAS[table]
+    casts = {c: schema[c] for c in df.columns if c in schema and df[c].dtype != schema[c]}
+
+    if not casts:
+        return df
+
+    for col, sentinels in NA_SENTINELS.get(table, {}).items():
+        if col in casts and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].replace(sentinels, np.nan)
+
+    return df.astype(casts)
+
+def cache_is_fresh(dataset_path, table, cache=None):
+
+    cache = cache or cache_path(dataset_path, table)
+
+    if not os.path.exists(cache):
+        return False
+
+    source = csv_path(dataset_path, table)
+
+    return not os.path.exists(source) or os.path.getmtime(cache) >= os.path.getmtime(source)
+
+def load_table(dataset_path, table, columns=None, filters=None):
+    """Load a results table sorted by GRBname, preferring the Parquet cache and falling back to the CSV.
+
+    `columns` loads only those columns, which must include GRBname. `filters`
+    (in pyarrow's [(column, op, value), ...] form) skips rows while reading the
+    Parquet cache; it is only a hint, since the CSV fallback returns every row.
+    """
+
+    if cache_is_fresh(dataset_path, table):
+        try:
+            df = pd.read_parquet(cache_path(dataset_path, table), columns=columns, filters=filters or None)
+            return sort_by_name(apply_schema(df.reset_index(drop=True), table))
+        except (ImportError, OSError, ValueError):
+            pass
+
+    return read_csv_table(dataset_path, table, columns)
+
+def count_rows(dataset_path, table):
+    """Number of rows in a table, without loading it."""
+
+    if pq is not None and cache_is_fresh(dataset_path, table):
+        try:
+            return pq.read_metadata(cache_path(dataset_path, table)).num_rows
+        except (ImportError, OSError, ValueError):
+            pass
+
+    return len(pd.read_csv(csv_path(dataset_path, table), usecols=['GRBname']))
+
+@timed('parse_ragged')
+def parse_ragged(df, table):
+    return {col: RaggedArray.from_strings(df[col]) for col in RAGGED_COLUMNS[table] if col in df.columns}
+
+def load_ragged(dataset_path, table, df):
+    """Load the pre-parsed list columns of a table, parsing `df` if no fresh cache exists."""
+
+    cache = ragged_cache_path(dataset_path, table)
+
+    if cache_is_fresh(dataset_path, table, cache):
+        try:
+            with np.load(cache) as npz:
+                return {col: RaggedArray(npz[f'{col}_values'], npz[f'{col}_offsets'])
+                        for col in RAGGED_COLUMNS[table] if f'{col}_values' in npz}
+        except (OSError, ValueError):
+            pass
+
+    return parse_ragged(df, table)
+
+def drop_list_columns(df, table):
+    """A table without its stringified list columns, once they are parsed into ragged arrays."""
+    return df.drop(columns=[c for c in RAGGED_COLUMNS[table] if c in df.columns])
+
+
+###############################################################################
+### INGEST
+
+def ingest_dataset(dataset_path):
+    """Convert each CSV table in a dataset folder to typed Parquet, plus an .npz of its parsed list columns.
+
+    Also writes the dataset's manifest.json (see functions.manifest).
+    """
+
+    from functions.manifest import write_manifest
+
+    written = {}
+
+    for table in TABLES:
+        if not os.path.exists(csv_path(dataset_path, table)):
+            continue
+
+        df = read_csv_table(dataset_path, table)
+        df.to_parquet(cache_path(dataset_path, table), index=False)
+
+        ragged = parse_ragged(df, table)
+        if ragged:
+            arrays = {}
+            for col, arr in ragged.items():
+                arrays[f'{col}_values'] = arr.values
+                arrays[f'{col}_offsets'] = arr.offsets
+            np.savez(ragged_cache_path(dataset_path, table), **arrays)
+
+        written[table] = df
+
+    write_manifest(dataset_path, written)
+
+    return list(written)
+
+def memory_report(dataset_path):
+    """Resident size in bytes of each table with pandas' default dtype inference, and as the dataset store holds it:
+    with TABLE_SCHEMAS, its list columns parsed into ragged arrays.
+    """
+
+    report = {}
+
+    for table in TABLES:
+        if not os.path.exists(csv_path(dataset_path, table)):
+            continue
+
+        inferred = pd.read_csv(csv_path(dataset_path, table))
+        df = load_table(dataset_path, table)
+        ragged = load_ragged(dataset_path, table, df)
+
+        report[table] = (int(inferred.memory_usage(deep=True).sum()),
+                         int(drop_list_columns(df, table).memory_usage(deep=True).sum()) +
+                         sum(a.values.nbytes + a.offsets.nbytes for a in ragged.values()))
+
+    return report
+
+def find_datasets(results_dir='results'):
+    return sorted(os.path.join(results_dir, d) for d in os.listdir(results_dir)
+                  if os.path.isdir(os.path.join(results_dir, d)))
+
+def main(argv=None):
+
+    argv = sys.argv[1:] if argv is None else argv
+    memory = '--memory' in argv
+    dataset_paths = [a for a in argv if a != '--memory'] or find_datasets()
+
+    for dataset_path in dataset_paths:
+        written = ingest_dataset(dataset_path)
+        print(f"{dataset_path}: {', '.join(written) if written else 'no tables found'}")
+
+        # --memory: compare resident size against pandas' default dtypes
+        if memory:
+            for table, (before, after) in memory_report(dataset_path).items():
+                print(f"  {table:<10} {before / 1024 ** 2:7.2f} MB -> {after / 1024 ** 2:7.2f} MB  ({before / after:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
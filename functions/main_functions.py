@@ -1,11 +1,20 @@
-import ast
 import math
+import functools
+import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import plotly.express as px
 import plotly.graph_objects as go 
+from plotly.subplots import make_subplots
 
-from app import COL_PRIMARY, COL_SECONDARY, COL_TERTIARTY
+from functions.custom_css import COL_PRIMARY, COL_SECONDARY, COL_TERTIARTY
+from functions.models import broken_powerlaw, fred, time_grid
+from functions.export import EXPORT_FORMATS, iter_table, iter_zip, figure_files, exports, content_key
+from functions.timing import span
+from functions.density import axis_values, density_grid, log_ticks
+from functions.correlation import CORRELATION_METHODS
+from functions.selection import region_mask, selection_stats, column_medians, burst_counts
 
 ###############################################################################
 ### BURST VIEWER
@@ -33,29 +42,25 @@ def get_table_multiple_values(df, colname, format="%.3g"):
 
     return [(format % val) for val in value_list]
 
-def get_table_list(df, colname):
+def get_table_list(df, ragged):
 
-    values = ast.literal_eval(df[colname].iloc[0].replace('nan', 'None'))
+    if df.empty:
+        return []
 
-    values_list = []
+    values = ragged[df.index[0]]
 
-    for v in values:
-        try:
-            values_list.append(float(v))
-        except:
-            values_list.append(0)
-
-    return values_list
+    return np.where(np.isnan(values), 0, values).tolist()
 
 def get_converted_fluence(df, fluence, conversion):
 
-    try:
-        total_fluence = ast.literal_eval(df[fluence].iloc[0])[0]
-        conv = df[conversion].iloc[0]
-    except IndexError: # afterglow doesn't exist
-        return "-" 
+    if df.empty: # afterglow doesn't exist
+        return "-"
+
+    row = fluence[df.index[0]]
+    total_fluence = row[0] if len(row) else math.nan
+    conv = df[conversion].iloc[0]
 
-    if df.empty or math.isnan(total_fluence) or math.isnan(conv):
+    if math.isnan(total_fluence) or math.isnan(conv):
         return "-"
     
     if (not total_fluence > 0) or (not conv > 0):
@@ -63,6 +68,10 @@ def get_converted_fluence(df, fluence, conversion):
     
     return '%.3g' % (total_fluence * conv)
 
+def trace_group(trace):
+    """Colour group of a plotly express trace, named "<colour>, <symbol>" or "<colour>"."""
+    return (trace.name or "").split(',')[0].strip()
+
 def print_grb_name(name):
 
     if name.startswith("GRB"):
@@ -71,67 +80,150 @@ def print_grb_name(name):
     return "GRB " + name
 
 
+def model_figure_layout(fig, x_title, y_title, log):
+
+    axis_settings = dict(showgrid=True, exponentformat="power")
+    fig.update_xaxes(title_text=x_title, type='log' if log else 'linear', **axis_settings)
+    fig.update_yaxes(title_text=y_title, type='log' if log else 'linear', **axis_settings)
+
+    fig.update_layout(
+        template='ggplot2',
+        font=dict(size=14),
+        margin=dict(t=30),
+        paper_bgcolor='rgb(255,255,255)',
+        font_color='black',
+        plot_bgcolor='rgb(240,242,246)',
+        legend=dict(title_text=""),
+        hovermode='x unified',
+    )
+
+    return fig
+
+def xrt_model_figure(slopes, breaks, normal, flare_params, flare_numbers):
+    """Interactive XRT light curve from the LAFF afterglow and flare parameters.
+
+    flare_params is a RaggedArray of (t_peak, rise, decay, sharpness, amplitude)
+    rows; slopes may be empty if there is no afterglow fit.
+    """
+
+    t_peak, rise, decay = (flare_params.column(i) for i in range(3))
+    edges = np.r_[breaks, t_peak - 3 * rise, t_peak + 5 * decay, 1e2, 1e5]
+    edges = edges[edges > 0]
+
+    t = time_grid(edges.min() / 2, edges.max() * 3, log=True)
+
+    fig = go.Figure()
+    total = np.zeros_like(t)
+
+    if len(slopes):
+        afterglow = broken_powerlaw(t, slopes, breaks, normal)
+        total += afterglow
+        fig.add_trace(go.Scatter(x=t, y=afterglow, mode='lines', name="Afterglow",
+                                 line=dict(color=COL_TERTIARTY, dash='dash')))
+
+    if len(flare_params):
+        flares = fred(t, *(flare_params.column(i) for i in range(5)))
+        total += flares.sum(axis=0)
+        for num, flare in zip(flare_numbers, flares):
+            fig.add_trace(go.Scatter(x=t, y=flare, mode='lines', name=f"Flare {num}",
+                                     line=dict(color=COL_SECONDARY, dash='dot')))
+
+    fig.add_trace(go.Scatter(x=t, y=total, mode='lines', name="Total model",
+                             line=dict(color=COL_PRIMARY, width=3)))
+
+    # flares fall to ~0 away from their peak, so bound the axis by the total model
+    positive = total[total > 0]
+    if len(positive):
+        y_max = np.log10(positive.max())
+        fig.update_yaxes(range=[max(np.log10(positive.min()), y_max - 5), y_max + 0.3])
+
+    return model_figure_layout(fig, "Time since trigger (s)", "Count rate (s<sup>-1</sup>)", log=True)
+
+def bat_model_figure(pulses):
+    """Interactive BAT light curve from the LAFF pulse parameters."""
+
+    t_start, t_stop = pulses['t_start'].min(), pulses['t_stop'].max()
+    pad = 0.1 * (t_stop - t_start)
+
+    t = time_grid(t_start - pad, t_stop + pad, log=False)
+    components = fred(t, pulses['t_peak'], pulses['rise'], pulses['decay'], pulses['sharp'], pulses['amplitude'])
+
+    fig = go.Figure()
+
+    for num, pulse in zip(pulses['pulse_num'], components):
+        fig.add_trace(go.Scatter(x=t, y=pulse, mode='lines', name=f"Pulse {num}",
+                                 line=dict(color=COL_SECONDARY, dash='dot')))
+
+    fig.add_trace(go.Scatter(x=t, y=components.sum(axis=0), mode='lines', name="Total model",
+                             line=dict(color=COL_PRIMARY, width=3)))
+
+    return model_figure_layout(fig, "Time since trigger (s)", "Count rate (s<sup>-1</sup>)", log=False)
+
+
 ###############################################################################
 ### POPULATION STATS
 
-def population_afterglow(data, data_cols, PARAM_SETTINGS, GRB_NAMES):
-    
-    plot_data = data.copy()
-    
-    ############################################################
-    ## COLUMN OPTIONS
+RENDER_MODES = ("Auto", "SVG", "WebGL")
+WEBGL_THRESHOLD = 1000 # points above which "Auto" switches to WebGL
+FIGURE_CACHE_SIZE = 32 # most recently used figures kept across sessions
 
-    if 'popstats_afterglow' not in st.session_state:
-        st.session_state['popstats_afterglow'] = {
-            'x_axis': list(data_cols.keys())[0],
-            'x_log': 'Log-scale',
-            'y_axis': list(data_cols.keys())[1],
-            'y_log': 'Log-scale',
-            'color_by': 'None',
-            'selected_grbs': []
-        }
-    persistent = st.session_state['popstats_afterglow']
-    
-    if 'popstats_shared_grbs' not in st.session_state:
-        st.session_state['popstats_shared_grbs'] = []
-    shared_grbs = st.session_state['popstats_shared_grbs']
-    selected_grbs = shared_grbs
-    
-        
-    with st.container(border=True):
-        xcol, ycol, lcol = st.columns(3)
-        
-        column_options = list(data_cols.keys())
-        
-        with xcol:
-            x_idx = column_options.index(persistent['x_axis']) if persistent['x_axis'] in column_options else 0
-            x_axis = st.selectbox("X-Axis Parameter", column_options, index=x_idx, key="x_axis_afterglow")
-            x_log = st.segmented_control("X-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['x_log'], key='x_log_afterglow', label_visibility='collapsed')
-            
-        with ycol:
-            y_idx = column_options.index(persistent['y_axis']) if persistent['y_axis'] in column_options else 1
-            y_axis = st.selectbox("Y-Axis Parameter", column_options, index=y_idx, key="y_axis_afterglow")
-            y_log = st.segmented_control("Y-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['y_log'], key='y_log_afterglow', label_visibility='collapsed')
-            
-        with lcol:
-            color_options = ["None", "Specific GRB"] + column_options
-            c_idx = color_options.index(persistent['color_by']) if persistent['color_by'] in color_options else 0
-            color_by = st.selectbox("Color By", color_options, index=c_idx, key="color_by_afterglow")
-    
-            if color_by == "Specific GRB":
-                selected_grbs = st.multiselect("Enter GRB Names:", GRB_NAMES, placeholder='Select GRBs', default=shared_grbs, label_visibility='collapsed', key="shared_grbs_afterglow")
-                st.session_state['popstats_shared_grbs'] = selected_grbs
-                selected_grbs = [x.replace(' ', '') for x in st.session_state['popstats_shared_grbs']]
+def get_render_mode(render_mode, n_points):
+    """px.scatter render_mode for a render mode option and point count."""
+
+    if render_mode == "Auto":
+        return 'webgl' if n_points > WEBGL_THRESHOLD else 'svg'
+
+    return render_mode.lower()
+
+def figure_cache(builder):
+    """st.cache_resource for a figure builder, handing each caller its own copy.
+
+    The cached figure is shared by every session and plotly figures are mutable;
+    copying one costs a fraction of building it. `__wrapped__` is the uncached builder.
+    """
+
+    cached = st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)(builder)
+
+    @functools.wraps(builder)
+    def copy(*args, **kwargs):
+        return go.Figure(cached(*args, **kwargs))
+
+    copy.clear = cached.clear
+    return copy
+
+def highlight_colors(selected_grbs):
+    """{name: marker colour} of highlighted bursts, in the order they were selected."""
+
+    color_cycle = px.colors.qualitative.Plotly
+
+    return {name: color_cycle[i % len(color_cycle)] for i, name in enumerate(selected_grbs)}
+
+def color_highlights(fig, selected_grbs):
+    """Colour and order the legend of a figure's highlighted bursts by selection order.
+
+    Figures are cached per set of highlighted bursts (sorted), so this is applied
+    to each session's copy; highlighted traces are named or grouped by burst.
+    """
+
+    colors = highlight_colors(selected_grbs)
+    ranks = {name: i for i, name in enumerate(selected_grbs)}
+
+    for trace in fig.data:
+        name = trace.legendgroup or trace.name
+        if name in colors:
+            trace.marker.color = colors[name]
+            trace.legendrank = 1001 + ranks[name] # after the other traces (rank 1000)
+
+    return fig
+
+@figure_cache
+def afterglow_figure(dataset_key, _data, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, color_by, selected_grbs, render_mode):
+    """Build the afterglow population figure; cached per dataset and plot control state."""
+
+    data = _data
+    plot_data = data.copy(deep=False)
+    plot_data['_pos'] = np.arange(len(data)) # row positions in `data`, so a box/lasso selection maps back to rows
 
-    st.session_state['popstats_afterglow'] = {
-        'x_axis': x_axis,
-        'y_axis': y_axis,
-        'x_log': x_log,
-        'y_log': y_log,
-        'color_by': color_by,
-    }
-    
-    
     ############################################################
     ## COLOURING CONFIG
 
@@ -143,7 +235,7 @@ def population_afterglow(data, data_cols, PARAM_SETTINGS, GRB_NAMES):
     
     
     if color_by == "Specific GRB":
-        color_column = data['GRBname'].apply(lambda x: x if x in selected_grbs else "Other GRBs")
+        color_column = data["GRBname"].astype(str).where(data["GRBname"].isin(selected_grbs), "Other GRBs")
         discrete_map = {"Other GRBs": "#a8a8a8"}
         
     elif color_by != "None":
@@ -166,25 +258,29 @@ def population_afterglow(data, data_cols, PARAM_SETTINGS, GRB_NAMES):
     x_u = PARAM_SETTINGS.get(data_cols[x_axis], {}).get('units', '')
     y_u = PARAM_SETTINGS.get(data_cols[y_axis], {}).get('units', '')
     
-    fig = px.scatter(
-        plot_data,
-        x=data_cols[x_axis],
-        y=data_cols[y_axis],
-        color=color_column,
-        color_discrete_map=discrete_map,
-        color_discrete_sequence=color_seq,
-        color_continuous_scale='Inferno',
-        category_orders=sorted_categorical,
-        hover_name="GRBname",
-        custom_data=['GRBname'],
-        log_x=(x_log == 'Log-scale'),
-        log_y=(y_log == 'Log-scale'),
-        labels={
-            data_cols[x_axis]: f"{x_axis} ({x_u})" if x_u else x_axis,
-            data_cols[y_axis]: f"{y_axis} ({y_u})" if y_u else y_axis,
-        },
-        template='ggplot2'
-    )
+    render_mode = get_render_mode(render_mode, len(plot_data))
+    
+    with span('px.scatter', points=len(plot_data)):
+        fig = px.scatter(
+            plot_data,
+            x=data_cols[x_axis],
+            y=data_cols[y_axis],
+            color=color_column,
+            color_discrete_map=discrete_map,
+            color_discrete_sequence=color_seq,
+            color_continuous_scale='Inferno',
+            category_orders=sorted_categorical,
+            hover_name="GRBname",
+            custom_data=['GRBname', '_pos'],
+            log_x=(x_log == 'Log-scale'),
+            log_y=(y_log == 'Log-scale'),
+            render_mode=render_mode,
+            labels={
+                data_cols[x_axis]: f"{x_axis} ({x_u})" if x_u else x_axis,
+                data_cols[y_axis]: f"{y_axis} ({y_u})" if y_u else y_axis,
+            },
+            template='ggplot2'
+        )
     
     ############################################################
     ## AXIS CONFIGS
@@ -213,93 +309,86 @@ def population_afterglow(data, data_cols, PARAM_SETTINGS, GRB_NAMES):
     
     
     if color_by == "Specific GRB":
-        color_cycle = px.colors.qualitative.Plotly
-        color_index = 0
+        grb_color_map = highlight_colors(selected_grbs)
+        highlighted = set(selected_grbs)
         
         for trace in fig.data:
-            if trace.name in selected_grbs:
-                trace.marker.color = color_cycle[color_index % len(color_cycle)]
+            if trace.name in highlighted:
+                trace.marker.color = grb_color_map[trace.name]
                 trace.marker.size = 15
                 trace.marker.line = dict(width=2, color='black')
-                color_index += 1
         
         traces = list(fig.data)
-        traces.sort(key=lambda x: 1 if x.name in selected_grbs else 0)
+        traces.sort(key=lambda x: 1 if x.name in highlighted else 0)
         fig.data = traces
 
+    return fig
 
 
-    ############################################################
-    ## EVENT HANDLING
+def clicked_burst(event):
+    """GRB name of the first selected point that carries one; density cells and marginal bars don't."""
+
+    points = event['selection']['points'] if event and "selection" in event else []
+
+    return next((p['customdata'][0] for p in points if p.get('customdata')), None)
+
+def open_clicked_burst(event):
+
+    clicked_grb = clicked_burst(event)
+
+    if clicked_grb:
+        st.session_state['viewer_grb'] = print_grb_name(clicked_grb)
+        st.switch_page("pages/burst_viewer.py")
+
+def population_afterglow(data, data_cols, PARAM_SETTINGS, GRB_NAMES, dataset_key, render_mode="Auto", view="Scatter"):
     
-    with st.container(border=True):
-                    
-        event = st.plotly_chart(fig, width='stretch', height=600, theme=None, on_select='rerun', selection_mode='points')
-        
-        if event and ("selection" in event) and len(event['selection']['points']) > 0:
-            clicked_grb = event['selection']['points'][0]['customdata'][0]
-            clicked_grb = clicked_grb[0:3] + ' ' + clicked_grb[3:]
-            
-            st.session_state['viewer_grb'] = clicked_grb
-            st.switch_page("pages/burst_viewer.py")
-            
-            
-################################################################
-################################################################      
-            
-            
-def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     
     ############################################################
     ## COLUMN OPTIONS
-    
-    column_options = list(data_cols.keys())
-    
-    if 'popstats_flares' not in st.session_state:
-        st.session_state['popstats_flares'] = {
-            'x_axis': column_options[0],
-            'y_axis': column_options[1],
+
+    if 'popstats_afterglow' not in st.session_state:
+        st.session_state['popstats_afterglow'] = {
+            'x_axis': list(data_cols.keys())[0],
             'x_log': 'Log-scale',
+            'y_axis': list(data_cols.keys())[1],
             'y_log': 'Log-scale',
             'color_by': 'None',
-            'selected_grbs': [],
+            'selected_grbs': []
         }
-    persistent = st.session_state['popstats_flares']
+    persistent = st.session_state['popstats_afterglow']
     
     if 'popstats_shared_grbs' not in st.session_state:
         st.session_state['popstats_shared_grbs'] = []
     shared_grbs = st.session_state['popstats_shared_grbs']
     selected_grbs = shared_grbs
     
-    
+        
     with st.container(border=True):
-        tcol, xcol, ycol, lcol = st.columns([1, 3, 3, 3])
+        xcol, ycol, lcol = st.columns(3)
         
-        with tcol:
-            flare_toggle = st.toggle("Flares", True)
-            pulse_toggle = st.toggle("Pulses", True)
+        column_options = list(data_cols.keys())
         
         with xcol:
             x_idx = column_options.index(persistent['x_axis']) if persistent['x_axis'] in column_options else 0
-            x_axis = st.selectbox("X-Axis Parameter", column_options, index=x_idx, key="x_axis_flares")
-            x_log = st.segmented_control("X-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['x_log'], key='x_log_flares', label_visibility='collapsed')
+            x_axis = st.selectbox("X-Axis Parameter", column_options, index=x_idx, key="x_axis_afterglow")
+            x_log = st.segmented_control("X-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['x_log'], key='x_log_afterglow', label_visibility='collapsed')
             
         with ycol:
             y_idx = column_options.index(persistent['y_axis']) if persistent['y_axis'] in column_options else 1
-            y_axis = st.selectbox("Y-Axis Parameter", column_options, index=y_idx, key="y_axis_flares")
-            y_log = st.segmented_control("Y-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['y_log'], key='y_log_flares', label_visibility='collapsed')
+            y_axis = st.selectbox("Y-Axis Parameter", column_options, index=y_idx, key="y_axis_afterglow")
+            y_log = st.segmented_control("Y-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['y_log'], key='y_log_afterglow', label_visibility='collapsed')
             
         with lcol:
             color_options = ["None", "Specific GRB"] + column_options
             c_idx = color_options.index(persistent['color_by']) if persistent['color_by'] in color_options else 0
-            color_by = st.selectbox("Color By", color_options, index=c_idx, key="color_by_flares")
-        
+            color_by = st.selectbox("Color By", color_options, index=c_idx, key="color_by_afterglow")
+    
             if color_by == "Specific GRB":
-                selected_grbs = st.multiselect("Enter GRB Names:", GRB_NAMES, placeholder='Select GRBs', default=shared_grbs, label_visibility='collapsed', key="shared_grbs_flares")
+                selected_grbs = st.multiselect("Enter GRB Names:", GRB_NAMES, placeholder='Select GRBs', default=shared_grbs, label_visibility='collapsed', key="shared_grbs_afterglow")
                 st.session_state['popstats_shared_grbs'] = selected_grbs
                 selected_grbs = [x.replace(' ', '') for x in st.session_state['popstats_shared_grbs']]
-        
-    st.session_state['popstats_flares'] = {
+
+    st.session_state['popstats_afterglow'] = {
         'x_axis': x_axis,
         'y_axis': y_axis,
         'x_log': x_log,
@@ -309,28 +398,65 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     
     
     ############################################################
-    ## COMBINING TABLES
+    ## FIGURE
+
+    # figures are cached per set of highlighted bursts, and coloured by selection order afterwards
+    selection_order = tuple(selected_grbs) if color_by == "Specific GRB" else ()
+    selected_grbs = tuple(sorted(selection_order))
+
+    with span('figure', table='afterglow', view=view):
+        if view == "Density":
+            fig = density_figure(dataset_key, 'Afterglows', data, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, selected_grbs)
+        else:
+            fig = afterglow_figure(dataset_key, data, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, color_by, selected_grbs, render_mode)
+        color_highlights(fig, selection_order)
 
-    f_df = df_flare.copy()
-    f_df['Type'] = 'Flares'
-    
-    p_df = df_pulse.copy()
-    p_df['Type'] = 'Pulses'
-    
-    combined_df = pd.concat([f_df, p_df], ignore_index=True)
 
-    sources_to_show = []
-    if flare_toggle: sources_to_show.append('Flares')
-    if pulse_toggle: sources_to_show.append('Pulses')
+    ############################################################
+    ## EVENT HANDLING
     
-    plot_data = combined_df[combined_df['Type'].isin(sources_to_show)].copy()
+    with st.container(border=True):
+                    
+        with span('plotly_chart'):
+            event = st.plotly_chart(fig, width='stretch', height=600, theme=None, on_select='rerun', selection_mode=SELECTION_MODES)
+
+    if region_selected(event):
+        selection_summary(event, view, dataset_key, 'Afterglows', data, data_cols, x_axis, y_axis, x_log, y_log)
+    else:
+        open_clicked_burst(event)
+
+    return plotted_rows(data, data_cols[x_axis], data_cols[y_axis], x_log, y_log), selected_grbs
+            
+            
+################################################################
+################################################################      
+            
+            
+@figure_cache
+def flares_figure(dataset_key, _population, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, color_by, selected_grbs, flare_toggle, pulse_toggle, render_mode):
+    """Build the flare/pulse population figure from a ComponentPopulation; cached per dataset and plot control state."""
+
+    ############################################################
+    ## SELECTING ROWS
+
+    sources_to_show = component_types(flare_toggle, pulse_toggle)
     
     filter_cols = [data_cols[x_axis], data_cols[y_axis]]
     
     if color_by not in ["None", "Specific GRB"]:
         filter_cols.append(data_cols[color_by])
 
-    plot_data = plot_data.dropna(subset=filter_cols)
+    # only the plotted columns are copied out of the shared table
+    plot_cols = ['GRBname', 'Type', 'Pulse/Flare Number'] + filter_cols
+    if color_by not in ["None", "Specific GRB"] and PARAM_SETTINGS.get(data_cols[color_by], {}).get('log'):
+        plot_cols.append(data_cols[color_by] + '_log')
+
+    plot_mask = _population.mask(sources_to_show, filter_cols)
+    plot_data = _population.rows(plot_mask, plot_cols)
+    plot_data['GRBname'] = plot_data['GRBname'].astype(str) # plotly copies categorical labels as slow object arrays
+
+    # row positions among all rows of the shown types, so a box/lasso selection maps back to rows
+    plot_data['_pos'] = (np.cumsum(_population.mask(sources_to_show)) - 1)[plot_mask]
     
     ############################################################
     ## COLOURING CONFIG
@@ -347,11 +473,9 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     symbol_map = {"Flares": 'circle', "Pulses": 'circle' if color_by in ('None') else 'diamond'}
 
     if color_by == "Specific GRB":
-            plot_data['ColorGroup'] = plot_data.apply(
-                lambda row: row['GRBname'] if row['GRBname'] in selected_grbs 
-                else f"Other {row['Type']}", 
-                axis=1
-            )
+            plot_data['ColorGroup'] = np.where(plot_data['GRBname'].isin(selected_grbs),
+                                               plot_data['GRBname'].astype(str),
+                                               "Other " + plot_data['Type'].astype(str))
             color_column = 'ColorGroup'
             
             discrete_map = {
@@ -380,6 +504,8 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     x_u = PARAM_SETTINGS.get(data_cols[x_axis], {}).get('units', '')
     y_u = PARAM_SETTINGS.get(data_cols[y_axis], {}).get('units', '')
     
+    render_mode = get_render_mode(render_mode, len(plot_data))
+    
     hover_dict = {
         'Type': True,
         'Pulse/Flare Number': True,
@@ -390,28 +516,30 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     if 'ColorGroup' in plot_data.columns:
         hover_dict['ColorGroup'] = True
     
-    fig = px.scatter(
-        plot_data,
-        x=data_cols[x_axis],
-        y=data_cols[y_axis],
-        color=color_column if color_by != "None" else "Type",
-        symbol="Type",
-        color_discrete_map=discrete_map if color_by == "Specific GRB" else background_map,
-        symbol_map=symbol_map,
-        color_continuous_scale='Inferno',
-        color_discrete_sequence=px.colors.qualitative.Plotly,
-        category_orders=sorted_categorical,
-        hover_name="GRBname",
-        hover_data=hover_dict,
-        custom_data=['GRBname'],
-        log_x=(x_log == 'Log-scale'),
-        log_y=(y_log == 'Log-scale'),
-        labels={
-            data_cols[x_axis]: f"{x_axis} ({x_u})" if x_u else x_axis,
-            data_cols[y_axis]: f"{y_axis} ({y_u})" if y_u else y_axis,
-        },
-        template='ggplot2'
-    )
+    with span('px.scatter', points=len(plot_data)):
+        fig = px.scatter(
+            plot_data,
+            x=data_cols[x_axis],
+            y=data_cols[y_axis],
+            color=color_column if color_by != "None" else "Type",
+            symbol="Type",
+            color_discrete_map=discrete_map if color_by == "Specific GRB" else background_map,
+            symbol_map=symbol_map,
+            color_continuous_scale='Inferno',
+            color_discrete_sequence=px.colors.qualitative.Plotly,
+            category_orders=sorted_categorical,
+            hover_name="GRBname",
+            hover_data=hover_dict,
+            custom_data=['GRBname', '_pos'],
+            log_x=(x_log == 'Log-scale'),
+            log_y=(y_log == 'Log-scale'),
+            render_mode=render_mode,
+            labels={
+                data_cols[x_axis]: f"{x_axis} ({x_u})" if x_u else x_axis,
+                data_cols[y_axis]: f"{y_axis} ({y_u})" if y_u else y_axis,
+            },
+            template='ggplot2'
+        )
     
     ############################################################
     ## AXIS CONFIGS
@@ -446,13 +574,12 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
 
     if color_by == "Specific GRB":
         
-        color_cycle = px.colors.qualitative.Plotly
-        grb_color_map = {name: color_cycle[i % len(color_cycle)] for i, name in enumerate(selected_grbs)}
+        grb_color_map = highlight_colors(selected_grbs)
         
         for trace in fig.data:
-            matched_grb = next((name for name in selected_grbs if name in trace.name), None)
+            matched_grb = trace_group(trace)
             
-            if matched_grb:
+            if matched_grb in grb_color_map:
                 trace.marker.color = grb_color_map[matched_grb]
                 trace.marker.size = 12
                 trace.marker.line = dict(width=2, color='black')
@@ -467,9 +594,10 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
     ## LEGEND CONFIG
 
     seen_groups = set()
+    highlighted = set(selected_grbs)
     
     for trace in fig.data:
-        is_highlighted = any(grb in trace.name for grb in selected_grbs)
+        is_highlighted = trace_group(trace) in highlighted
         
         if is_highlighted:
             trace.showlegend = False
@@ -487,11 +615,13 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
 
     if color_by == "Specific GRB" and selected_grbs:
         
+        legend_trace = go.Scattergl if render_mode == 'webgl' else go.Scatter
+
         for grb_name in selected_grbs:
 
             color = grb_color_map.get(grb_name, 'black')
             
-            fig.add_trace(go.Scatter(
+            fig.add_trace(legend_trace(
                 x=[None], y=[None],
                 mode='markers',
                 name=grb_name,
@@ -506,7 +636,7 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
             ))
 
     new_data = list(fig.data)
-    proxies = [t for t in new_data if t.name in selected_grbs and t.showlegend]
+    proxies = [t for t in new_data if t.name in highlighted and t.showlegend]
     others = [t for t in new_data if t not in proxies]
     fig.data = others + proxies
     
@@ -526,18 +656,430 @@ def population_flares(df_flare, df_pulse, data_cols, PARAM_SETTINGS, GRB_NAMES):
             trace.hoverinfo = 'all'
             trace.customdata = trace.customdata 
 
+    return fig
 
+
+def component_types(flare_toggle, pulse_toggle):
+    return [kind for kind, shown in (('Flares', flare_toggle), ('Pulses', pulse_toggle)) if shown]
+
+def population_flares(population, data_cols, PARAM_SETTINGS, GRB_NAMES, dataset_key, render_mode="Auto", view="Scatter"):
+    
     ############################################################
-    ## EVENT HANDLING
+    ## COLUMN OPTIONS
+    
+    column_options = list(data_cols.keys())
+    
+    if 'popstats_flares' not in st.session_state:
+        st.session_state['popstats_flares'] = {
+            'x_axis': column_options[0],
+            'y_axis': column_options[1],
+            'x_log': 'Log-scale',
+            'y_log': 'Log-scale',
+            'color_by': 'None',
+            'selected_grbs': [],
+        }
+    persistent = st.session_state['popstats_flares']
+    
+    if 'popstats_shared_grbs' not in st.session_state:
+        st.session_state['popstats_shared_grbs'] = []
+    shared_grbs = st.session_state['popstats_shared_grbs']
+    selected_grbs = shared_grbs
+    
     
     with st.container(border=True):
+        tcol, xcol, ycol, lcol = st.columns([1, 3, 3, 3])
         
-        event = st.plotly_chart(fig, width='stretch', height=600, theme=None, on_select='rerun', selection_mode='points')
+        with tcol:
+            flare_toggle = st.toggle("Flares", True)
+            pulse_toggle = st.toggle("Pulses", True)
         
-        if event and ("selection" in event) and len(event['selection']['points']) > 0:
-            clicked_grb = event['selection']['points'][0]['customdata'][0]
-            clicked_grb = clicked_grb[0:3] + ' ' + clicked_grb[3:]
+        with xcol:
+            x_idx = column_options.index(persistent['x_axis']) if persistent['x_axis'] in column_options else 0
+            x_axis = st.selectbox("X-Axis Parameter", column_options, index=x_idx, key="x_axis_flares")
+            x_log = st.segmented_control("X-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['x_log'], key='x_log_flares', label_visibility='collapsed')
+            
+        with ycol:
+            y_idx = column_options.index(persistent['y_axis']) if persistent['y_axis'] in column_options else 1
+            y_axis = st.selectbox("Y-Axis Parameter", column_options, index=y_idx, key="y_axis_flares")
+            y_log = st.segmented_control("Y-Axis scale", ("Linear-scale", "Log-scale"), selection_mode='single', default=persistent['y_log'], key='y_log_flares', label_visibility='collapsed')
             
-            st.session_state['viewer_grb'] = clicked_grb
+        with lcol:
+            color_options = ["None", "Specific GRB"] + column_options
+            c_idx = color_options.index(persistent['color_by']) if persistent['color_by'] in color_options else 0
+            color_by = st.selectbox("Color By", color_options, index=c_idx, key="color_by_flares")
+        
+            if color_by == "Specific GRB":
+                selected_grbs = st.multiselect("Enter GRB Names:", GRB_NAMES, placeholder='Select GRBs', default=shared_grbs, label_visibility='collapsed', key="shared_grbs_flares")
+                st.session_state['popstats_shared_grbs'] = selected_grbs
+                selected_grbs = [x.replace(' ', '') for x in st.session_state['popstats_shared_grbs']]
+        
+    st.session_state['popstats_flares'] = {
+        'x_axis': x_axis,
+        'y_axis': y_axis,
+        'x_log': x_log,
+        'y_log': y_log,
+        'color_by': color_by,
+    }
+    
+    
+    ############################################################
+    ## FIGURE
+
+    # figures are cached per set of highlighted bursts, and coloured by selection order afterwards
+    selection_order = tuple(selected_grbs) if color_by == "Specific GRB" else ()
+    selected_grbs = tuple(sorted(selection_order))
+
+    types = component_types(flare_toggle, pulse_toggle)
+
+    with span('figure', table='flares/pulses', view=view):
+        if view == "Density":
+            rows = population.rows(population.mask(types), ['GRBname', data_cols[x_axis], data_cols[y_axis]])
+            fig = density_figure(dataset_key, '+'.join(types), rows, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, selected_grbs)
+        else:
+            fig = flares_figure(dataset_key, population, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, color_by, selected_grbs, flare_toggle, pulse_toggle, render_mode)
+        color_highlights(fig, selection_order)
+
+
+    ############################################################
+    ## EVENT HANDLING
+    
+    with st.container(border=True):
+        
+        with span('plotly_chart'):
+            event = st.plotly_chart(fig, width='stretch', height=600, theme=None, on_select='rerun', selection_mode=SELECTION_MODES)
+
+    if region_selected(event):
+        selection_summary(event, view, dataset_key, '+'.join(types), population.rows(population.mask(types)),
+                          data_cols, x_axis, y_axis, x_log, y_log, by='Type')
+    else:
+        open_clicked_burst(event)
+
+    # labels of the plotted rows in the flare and pulse tables, as in plotted_rows
+    log_cols = [data_cols[axis] for axis, scale in ((x_axis, x_log), (y_axis, y_log)) if scale == 'Log-scale']
+    mask = population.mask(types, [data_cols[x_axis], data_cols[y_axis]], log_cols)
+
+    return (population.labels(mask, 'Flares'), population.labels(mask, 'Pulses')), selected_grbs
+
+
+def plotted_rows(df, x_col, y_col, x_log, y_log):
+    """Rows of `df` that appear on the plot: both values present, and positive on log axes."""
+
+    mask = df[x_col].notna() & df[y_col].notna()
+
+    for col, scale in ((x_col, x_log), (y_col, y_log)):
+        if scale == 'Log-scale' and pd.api.types.is_numeric_dtype(df[col]):
+            mask &= df[col] > 0
+
+    return df[mask]
+
+
+###############################################################################
+### DENSITY VIEW
+
+PLOT_VIEWS = ("Scatter", "Density")
+DENSITY_AXES = ('x3', 'y3') # the heatmap's axes: make_subplots numbers them row by row
+
+@figure_cache
+def density_figure(dataset_key, population, _data, data_cols, PARAM_SETTINGS, x_axis, y_axis, x_log, y_log, selected_grbs):
+    """2D histogram of a population with marginal histograms, binned server-side so its size
+    doesn't grow with the number of points; highlighted bursts are overlaid as markers.
+
+    `population` names the rows in `_data` (e.g. "Flares+Pulses") for the cache key. Log
+    axes are binned and drawn in log10 space, with 10^n tick labels.
+    """
+
+    x_col, y_col = data_cols[x_axis], data_cols[y_axis]
+    x_is_log, y_is_log = x_log == 'Log-scale', y_log == 'Log-scale'
+
+    x = axis_values(_data[x_col], x_is_log)
+    y = axis_values(_data[y_col], y_is_log)
+    counts, x_edges, y_edges = density_grid(x, y, x_is_log, y_is_log)
+
+    x_centres = (x_edges[1:] + x_edges[:-1]) / 2
+    y_centres = (y_edges[1:] + y_edges[:-1]) / 2
+
+    fig = make_subplots(rows=2, cols=2, shared_xaxes=True, shared_yaxes=True,
+                        column_widths=[0.85, 0.15], row_heights=[0.15, 0.85],
+                        horizontal_spacing=0.01, vertical_spacing=0.01)
+
+    fig.add_trace(go.Heatmap(x=x_edges, y=y_edges, z=np.where(counts > 0, counts, np.nan),
+                             colorscale='Inferno', reversescale=True, colorbar=dict(title="Count", len=0.8, y=0.4),
+                             hovertemplate="Count: %{z}<extra></extra>", name="Density"), row=2, col=1)
+    fig.add_trace(go.Bar(x=x_centres, y=counts.sum(axis=0), width=np.diff(x_edges), marker_color=COL_PRIMARY,
+                         hovertemplate="%{y}<extra></extra>", showlegend=False), row=1, col=1)
+    fig.add_trace(go.Bar(y=y_centres, x=counts.sum(axis=1), width=np.diff(y_edges), orientation='h', marker_color=COL_PRIMARY,
+                         hovertemplate="%{x}<extra></extra>", showlegend=False), row=2, col=2)
+
+
+    ############################################################
+    ## HIGHLIGHTED BURSTS
+
+    grb_color_map = highlight_colors(selected_grbs)
+    names = _data['GRBname'].astype(str)
+
+    for grb in selected_grbs:
+        rows = (names == grb).to_numpy()
+        fig.add_trace(go.Scatter(x=x[rows], y=y[rows], mode='markers', name=grb,
+                                 customdata=[[grb]] * int(rows.sum()), hovertemplate=f"{grb}<extra></extra>",
+                                 marker=dict(size=12, color=grb_color_map[grb], line=dict(width=2, color='black'))),
+                      row=2, col=1)
+
+
+    ############################################################
+    ## AXIS CONFIGS
+
+    def title(axis):
+        units = PARAM_SETTINGS.get(data_cols[axis], {}).get('units', '')
+        return f"{axis} ({units})" if units else axis
+
+    axis_settings = dict(showgrid=True, exponentformat="power")
+    fig.update_xaxes(**axis_settings)
+    fig.update_yaxes(**axis_settings)
+    fig.update_xaxes(title_text=title(x_axis), row=2, col=1)
+    fig.update_yaxes(title_text=title(y_axis), row=2, col=1)
+
+    if x_is_log:
+        tickvals, ticktext = log_ticks(x_edges)
+        fig.update_xaxes(tickvals=tickvals, ticktext=ticktext, row=2, col=1)
+    if y_is_log:
+        tickvals, ticktext = log_ticks(y_edges)
+        fig.update_yaxes(tickvals=tickvals, ticktext=ticktext, row=2, col=1)
+
+    fig.update_layout(
+        font=dict(size=16),
+        margin=dict(t=30),
+        paper_bgcolor='rgb(255,255,255)',
+        font_color='black',
+        plot_bgcolor='rgb(240,242,246)',
+        bargap=0,
+        legend=dict(title_text="", y=0.96),
+        template='ggplot2',
+    )
+
+    return fig
+
+
+###############################################################################
+### CORRELATION MATRIX
+
+def correlation_figure(corr, data_cols, method):
+    """Correlogram of one method from functions.correlation.correlations, one clickable square per parameter pair."""
+
+    labels = {col: label for label, col in data_cols.items()}
+    columns = list(corr[method].columns)
+
+    x, y, r, hover, custom = [], [], [], [], []
+
+    for i, row in enumerate(columns):
+        for j, col in enumerate(columns):
+            value = corr[method].iat[i, j]
+            if not np.isfinite(value):
+                continue
+
+            x.append(labels[col])
+            y.append(labels[row])
+            r.append(value)
+            custom.append([labels[col], labels[row]])
+
+            if i == j:
+                hover.append(f"{labels[col]}<br>N = {corr['n'].iat[i, j]}")
+            else:
+                p = corr[f'{method}_p'].iat[i, j]
+                hover.append(f"{labels[col]} vs {labels[row]}<br>{CORRELATION_METHODS[method]} = {value:.3f}"
+                             f"<br>p = {p:.2g}<br>N = {corr['n'].iat[i, j]}")
+
+    fig = go.Figure(go.Scatter(
+        x=x, y=y, mode='markers+text',
+        text=[f"{v:.2f}" for v in r], textfont=dict(size=11),
+        marker=dict(symbol='square', size=max(12, 440 // max(len(columns), 1)), color=r,
+                    colorscale='RdBu', reversescale=True, cmin=-1, cmax=1,
+                    colorbar=dict(title=CORRELATION_METHODS[method])),
+        customdata=custom, hovertext=hover, hoverinfo='text',
+    ))
+
+    fig.update_xaxes(categoryorder='array', categoryarray=[labels[c] for c in columns], tickangle=-45, showgrid=False)
+    fig.update_yaxes(categoryorder='array', categoryarray=[labels[c] for c in columns], autorange='reversed', showgrid=False)
+    fig.update_layout(
+        font=dict(size=14),
+        margin=dict(t=30),
+        paper_bgcolor='rgb(255,255,255)',
+        font_color='black',
+        plot_bgcolor='rgb(255,255,255)',
+    )
+
+    return fig
+
+def correlation_panel(corr, data_cols, PARAM_SETTINGS, suffix):
+    """Correlation matrix of every plotted parameter; clicking a pair plots it.
+
+    `suffix` is that of the plot's widget keys ('afterglow' or 'flares').
+    """
+
+    chart_key = f'corr_chart_{suffix}'
+
+    def plot_pair():
+        points = st.session_state[chart_key]['selection']['points']
+        if not points or not points[0].get('customdata'):
+            return
+
+        x_axis, y_axis = points[0]['customdata'][:2]
+
+        for axis, label in (('x', x_axis), ('y', y_axis)):
+            log = PARAM_SETTINGS.get(data_cols[label], {}).get('log', False)
+            st.session_state[f'{axis}_axis_{suffix}'] = label
+            st.session_state[f'{axis}_log_{suffix}'] = 'Log-scale' if log else 'Linear-scale'
+            st.session_state[f'popstats_{suffix}'].update({f'{axis}_axis': label, f'{axis}_log': st.session_state[f'{axis}_log_{suffix}']})
+
+    with st.expander("Parameter correlations", icon=':material/grid_on:'):
+
+        method = st.segmented_control("Method", list(CORRELATION_METHODS), format_func=CORRELATION_METHODS.get, default='pearson',
+                                      selection_mode='single', key=f'corr_method_{suffix}') or 'pearson'
+
+        st.plotly_chart(correlation_figure(corr, data_cols, method), width='stretch', height=600, theme=None,
+                        on_select=plot_pair, selection_mode='points', key=chart_key)
+
+        st.caption("Click a pair to plot it above. Pearson uses log10 values for parameters plotted on log axes; "
+                   "each pair uses the rows where both parameters are present (N in the hover). "
+                   "Spearman and Kendall use a fixed random sample on very large populations.")
+
+
+###############################################################################
+### PLOT SELECTIONS
+
+SELECTION_MODES = ('points', 'box', 'lasso')
+
+def selection_regions(event, axes=None):
+    """(boxes, lassos) drawn in a plotly_chart selection event, optionally only those on `axes` (xref, yref)."""
+
+    selection = event['selection'] if event and "selection" in event else {}
+
+    def on_axes(region):
+        return axes is None or (region.get('xref', 'x'), region.get('yref', 'y')) == axes
+
+    return [r for r in selection.get('box', []) if on_axes(r)], [r for r in selection.get('lasso', []) if on_axes(r)]
+
+def region_selected(event):
+    """Whether the points were picked with the box or lasso tool rather than clicked."""
+    return any(selection_regions(event))
+
+def selected_positions(event, view, data, x_col, y_col, x_log, y_log):
+    """Positions in `data`, the rows of the plotted population, picked by a box or lasso selection.
+
+    Scatter points carry their position as the second customdata value; density
+    cells aren't points, so there the rows inside the regions drawn on the heatmap are found.
+    """
+
+    if view == "Density":
+        x = axis_values(data[x_col], x_log == 'Log-scale')
+        y = axis_values(data[y_col], y_log == 'Log-scale')
+        return np.flatnonzero(region_mask(x, y, *selection_regions(event, DENSITY_AXES)))
+
+    points = event['selection']['points']
+    return np.unique(np.array([p['customdata'][1] for p in points if len(p.get('customdata') or ()) > 1], dtype='int64'))
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE, show_spinner=False)
+def population_medians(dataset_key, population, _data, data_cols):
+    """Median of every parameter over a population, named by `population` for the cache key as in density_figure.
+
+    Shared by every session, so read-only.
+    """
+
+    medians = column_medians(_data, data_cols)
+    medians.flags.writeable = False
+
+    return medians
+
+def selection_summary(event, view, dataset_key, population, data, data_cols, x_axis, y_axis, x_log, y_log, by=None):
+    """Statistics of the points picked with the box or lasso tool, and the bursts they belong to.
+
+    `data` holds every row of the plotted population; selecting a burst in the
+    list opens it in the Burst Viewer. `by` splits the per-burst counts (e.g. by 'Type').
+    """
+
+    with span('selection'):
+        rows = data.iloc[selected_positions(event, view, data, data_cols[x_axis], data_cols[y_axis], x_log, y_log)]
+        stats = selection_stats(rows, data_cols, population_medians(dataset_key, population, data, data_cols))
+        bursts = burst_counts(rows, by)
+
+    with st.container(border=True):
+
+        st.markdown(f"**Selection:** {len(rows)} of {len(data)} points, from {len(bursts)} GRBs")
+
+        if rows.empty:
+            st.caption("No points in the selected region.")
+            return
+
+        scol, gcol = st.columns([3, 1])
+
+        with scol:
+            number = st.column_config.NumberColumn(format="%.3g")
+            st.dataframe(stats, column_config={c: number for c in stats.columns if c != 'N'})
+
+        with gcol:
+            event = st.dataframe(bursts, on_select='rerun', selection_mode='single-row', key=f'selection_grbs_{population}')
+
+        if event.selection.rows:
+            st.session_state['viewer_grb'] = print_grb_name(bursts.index[event.selection.rows[0]])
             st.switch_page("pages/burst_viewer.py")
-            
\ No newline at end of file
+
+        st.caption("Select a GRB in the list to open it in the Burst Viewer; double-click the plot to clear the selection.")
+
+
+###############################################################################
+### EXPORT
+
+def export_panel(tables, dataset, prefix, key, highlighted=()):
+    """Download links for each {table: rows} plus a zip of the bursts' figures.
+
+    Files are streamed by the export route of functions.api when a link is
+    followed, so nothing is generated or held in memory beforehand.
+    """
+
+    with st.popover("Export", icon=':material/download:'):
+
+        if not exports.enabled:
+            st.caption("Downloads are served by the export route: start the viewer with `streamlit run server.py`.")
+            return
+
+        fmt = st.segmented_control("File format", list(EXPORT_FORMATS), default='CSV', selection_mode='single', key=f'{key}_format') or 'CSV'
+        ext, mime = EXPORT_FORMATS[fmt]
+
+        if highlighted and st.toggle("Only highlighted GRBs", key=f'{key}_highlighted'):
+            tables = {table: df[df['GRBname'].isin(highlighted)] for table, df in tables.items()}
+
+        session = get_script_run_ctx().session_id
+
+        for table, df in tables.items():
+            url = exports.register(session, (dataset.key, table, fmt, content_key(df)), f"{prefix}_{table}.{ext}", mime,
+                                   lambda table=table, df=df: iter_table(dataset.with_list_columns(table, df), fmt))
+            st.link_button(f"{table.capitalize()} ({len(df)} rows)", url, icon=':material/table:', width='stretch')
+
+        names = sorted(set().union(*(df['GRBname'].astype(str).unique() for df in tables.values())))
+        figures = list(figure_files(dataset.path, names, dataset.figure_names))
+
+        url = exports.register(session, (dataset.key, 'figures', tuple(names)), f"{prefix}_figures.zip", 'application/zip',
+                               lambda: iter_zip(figures))
+        st.link_button(f"Figures ({len(figures)} PNG, zip)", url, icon=':material/image:', width='stretch', disabled=not figures)
+
+
+###############################################################################
+### PERFORMANCE PANEL
+
+def perf_panel(recorder):
+    """Sidebar breakdown of the spans timed during this rerun (see functions.timing)."""
+
+    spans = recorder.ordered()
+
+    with st.sidebar.expander(f"Performance: {recorder.total_ms:.0f} ms", icon=':material/timer:'):
+        if not spans:
+            st.caption("No spans recorded.")
+            return
+
+        table = pd.DataFrame({
+            'Span': [' ' * s['depth'] + s['name'] for s in spans],
+            'ms': [round(s['ms'], 1) for s in spans],
+            'Start': [round(s['start_ms'], 1) for s in spans],
+            'Detail': [', '.join(f"{k}={v}" for k, v in s.items() if k not in ('name', 'ms', 'start_ms', 'depth')) for s in spans],
+        })
+        st.dataframe(table, hide_index=True)
+        st.caption("Logged as JSON to the 'laff.perf' logger. Disable with ?perf=0.")
@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+
+from functions.ingest import TABLES, csv_path, count_rows, load_table
+from functions.name_index import burst_triggers
+from functions.images import INSTRUMENTS, figures_path
+
+###############################################################################
+### DATASET MANIFEST
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 2 # 2: per-burst trigger IDs
+
+def manifest_path(dataset_path):
+    return os.path.join(dataset_path, MANIFEST_NAME)
+
+def parse_dataset_name(folder_name):
+    """(date, version) from a results folder name like "2505_1.0.0", or None if it isn't one."""
+
+    parts = os.path.basename(os.path.normpath(folder_name)).split('_')
+
+    if len(parts) != 2:
+        return None
+
+    date, version = parts
+
+    if len(date) != 4 or not date.isdigit() or not 1 <= int(date[2:]) <= 12 or not version:
+        return None
+
+    return f"20{date[:2]}-{date[2:]}", version
+
+def file_hash(path, chunk_size=1 << 20):
+
+    digest = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+def build_manifest(dataset_path, tables=None):
+    """Describe a dataset folder: version, date, per table its rows, schema and CSV hash,
+    and every burst with its trigger ID, for the search index.
+
+    `tables` maps table names to already loaded DataFrames, used for the schema;
+    tables not given are left without columns.
+    """
+
+    tables = tables or {}
+    date, version = parse_dataset_name(dataset_path) or (None, None)
+
+    manifest = {
+        'manifest_version': MANIFEST_VERSION,
+        'dataset': os.path.basename(os.path.normpath(dataset_path)),
+        'date': date,
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'tables': {},
+        'figures': {},
+        'bursts': {},
+    }
+
+    for table in TABLES:
+        path = csv_path(dataset_path, table)
+        if not os.path.exists(path):
+            continue
+
+        df = tables.get(table)
+
+        manifest['tables'][table] = {
+            'rows': len(df) if df is not None else count_rows(dataset_path, table),
+            'columns': {col: str(dtype) for col, dtype in df.dtypes.items()} if df is not None else {},
+            'bytes': os.path.getsize(path),
+            'sha256': file_hash(path),
+        }
+
+    for instrument in INSTRUMENTS:
+        folder = figures_path(dataset_path, instrument)
+        if os.path.isdir(folder):
+            manifest['figures'][instrument] = sum(f.endswith('.png') for f in os.listdir(folder))
+
+    manifest['bursts'] = burst_triggers({table: tables[table] if table in tables else load_table(dataset_path, table, ['GRBname', 'Trig_ID'])
+                                         for table in manifest['tables']})
+
+    # one hash for the whole dataset, used to key anything cached from it
+    combined = hashlib.sha256()
+    for table, entry in sorted(manifest['tables'].items()):
+        combined.update(f"{table}:{entry['sha256']};".encode())
+    manifest['sha256'] = combined.hexdigest()
+
+    return manifest
+
+def write_manifest(dataset_path, tables=None):
+
+    manifest = build_manifest(dataset_path, tables)
+    path = manifest_path(dataset_path)
+
+    # written aside and renamed, so concurrent readers never see half a file
+    with open(f"{path}.{os.getpid()}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    return manifest
+
+def ensure_manifest(dataset_path):
+    """Manifest of a dataset, written first if it is missing or stale.
+
+    Generated manifests aren't checked in, so on a fresh checkout the first load
+    writes one; None if the folder isn't writable.
+    """
+
+    manifest = read_manifest(dataset_path)
+
+    if manifest is None:
+        try:
+            manifest = write_manifest(dataset_path)
+        except OSError:
+            return None
+
+    return manifest
+
+
+###############################################################################
+### READING
+
+_manifests = {}
+
+def manifest_is_fresh(dataset_path):
+    """True if the manifest exists and no CSV has been modified since it was written."""
+
+    try:
+        written = os.path.getmtime(manifest_path(dataset_path))
+    except OSError:
+        return False
+
+    for table in TABLES:
+        path = csv_path(dataset_path, table)
+        if os.path.exists(path) and os.path.getmtime(path) > written:
+            return False
+
+    return True
+
+def read_manifest(dataset_path):
+    """Manifest of a dataset, or None if it is missing, stale or unreadable.
+
+    Parsed manifests are kept in memory keyed on the file's mtime, so repeat
+    reads only cost a few stat calls.
+    """
+
+    if not manifest_is_fresh(dataset_path):
+        return None
+
+    path = manifest_path(dataset_path)
+    mtime = os.path.getmtime(path)
+    cached = _manifests.get(path)
+
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('manifest_version') != MANIFEST_VERSION:
+        return None
+
+    _manifests[path] = (mtime, manifest)
+
+    return manifest
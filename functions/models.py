@@ -0,0 +1,38 @@
+import numpy as np
+
+###############################################################################
+### LAFF MODELS
+
+def broken_powerlaw(t, slopes, breaks, normal):
+    """Continuous broken power law, normal * t^-slopes[0] before the first break."""
+
+    t = np.asarray(t, dtype='float64')
+    slopes = np.asarray(slopes, dtype='float64')
+    breaks = np.asarray(breaks, dtype='float64')
+
+    # segment each time falls in, and the normalisation that keeps each segment continuous
+    segment = np.searchsorted(breaks, t, side='left')
+    norms = normal * np.cumprod(np.r_[1.0, breaks ** (slopes[1:] - slopes[:-1])])
+
+    return norms[segment] * t ** -slopes[segment]
+
+def fred(t, t_peak, rise, decay, sharpness, amplitude):
+    """Fast-rise exponential-decay components, one row per component.
+
+    Parameters may be arrays of length n, giving an (n, len(t)) result.
+    """
+
+    t = np.asarray(t, dtype='float64')[None, :]
+    t_peak, rise, decay, sharpness, amplitude = (np.asarray(p, dtype='float64')[:, None]
+                                                for p in (t_peak, rise, decay, sharpness, amplitude))
+
+    width = np.where(t <= t_peak, rise, decay)
+
+    return amplitude * np.exp(-(np.abs(t - t_peak) / width) ** sharpness)
+
+def time_grid(t_min, t_max, n=2000, log=True):
+
+    if log:
+        return np.logspace(np.log10(t_min), np.log10(t_max), n)
+
+    return np.linspace(t_min, t_max, n)
@@ -0,0 +1,175 @@
+import difflib
+import numpy as np
+import pandas as pd
+
+###############################################################################
+### NAME INDEX
+
+def upper_names(names):
+    """Upper-cased GRBname values as an object array, upper-casing each category once for categoricals."""
+
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        return names.cat.categories.str.upper().to_numpy(dtype=object)[names.cat.codes.to_numpy()]
+
+    return names.str.upper().to_numpy(dtype=object)
+
+def build_name_index(df):
+    """Map each upper-cased GRBname to its (start, stop) row slice.
+
+    Requires the table to be sorted by name, as returned by functions.ingest.load_table.
+    """
+
+    names = upper_names(df['GRBname'])
+
+    if not len(names):
+        return {}
+
+    starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]])
+    stops = np.r_[starts[1:], len(names)]
+
+    return {names[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+def build_dataset_index(tables):
+    """Name index for each table in a {table: DataFrame} mapping."""
+
+    return {table: build_name_index(df) for table, df in tables.items()}
+
+def lookup_rows(df, name_index, name):
+    """Rows of `df` belonging to a burst, as a contiguous slice."""
+
+    start, stop = name_index.get(name.upper(), (0, 0))
+
+    return df.iloc[start:stop]
+
+
+###############################################################################
+### NAME SEARCH
+
+# alias kinds, in ranking order
+ALIAS_NAME, ALIAS_SHORT, ALIAS_TRIGGER = 0, 1, 2
+
+def normalise_query(text):
+    """Upper-case and drop spaces and any "GRB" prefix, e.g. "grb 050525a" -> "050525A"."""
+
+    text = text.strip().upper().replace(" ", "")
+
+    return text[3:] if text.startswith("GRB") else text
+
+
+class NameSearchIndex:
+    """Sorted prefix array over GRB names and their aliases.
+
+    Each canonical name (e.g. "GRB050525A") is reachable from "050525A", from
+    "050525" when it is the first burst of the day (suffix "A"), and from its
+    Swift trigger ID. Equal keys are ordered by alias kind, so a name or short
+    form wins over a trigger ID with the same digits (e.g. "150314").
+    """
+
+    def __init__(self, names, trigger_ids=None):
+
+        self.names = sorted(set(names))
+        self.short_names = {normalise_query(name): name for name in self.names}
+        trigger_ids = trigger_ids or {}
+
+        keys, targets, kinds = [], [], []
+
+        for i, name in enumerate(self.names):
+            short = normalise_query(name)
+            aliases = [(short, ALIAS_NAME)]
+
+            if short.endswith("A") and short[:-1].isdigit():
+                aliases.append((short[:-1], ALIAS_SHORT))
+
+            if name in trigger_ids:
+                aliases.append((str(trigger_ids[name]), ALIAS_TRIGGER))
+
+            for key, kind in aliases:
+                keys.append(key)
+                targets.append(i)
+                kinds.append(kind)
+
+        keys = np.array(keys, dtype=str)
+        kinds = np.array(kinds, dtype='int8')
+        order = np.lexsort((np.array(targets), kinds, keys))
+
+        self.keys = keys[order]
+        self.targets = np.array(targets, dtype='int64')[order]
+        self.kinds = kinds[order]
+
+    def candidates(self, text):
+        """Canonical names whose best-ranked alias equals `text` exactly; several when a trigger ID is shared."""
+
+        key = normalise_query(text)
+        lo, hi = np.searchsorted(self.keys, key, side='left'), np.searchsorted(self.keys, key, side='right')
+
+        if lo == hi:
+            return []
+
+        best = self.kinds[lo:hi] == self.kinds[lo]
+        return [self.names[i] for i in self.targets[lo:hi][best]]
+
+    def resolve(self, text):
+        """Canonical name for an exact name or alias match, otherwise None (also when the match is ambiguous)."""
+
+        candidates = self.candidates(text)
+
+        return candidates[0] if len(candidates) == 1 else None
+
+    def query(self, text, limit=10):
+        """Canonical names matching `text`, best first.
+
+        Exact matches rank above prefix matches, shorter completions above longer
+        ones and names above short-form and trigger aliases. With no prefix match,
+        falls back to fuzzy matching on the names.
+        """
+
+        key = normalise_query(text)
+
+        if not key:
+            return []
+
+        lo = np.searchsorted(self.keys, key, side='left')
+        hi = np.searchsorted(self.keys, key + '\uffff', side='left')
+
+        if hi > lo:
+            extra = np.char.str_len(self.keys[lo:hi]) - len(key)
+            ranked = np.lexsort((self.targets[lo:hi], self.kinds[lo:hi], extra))
+
+            matches = []
+            for idx in self.targets[lo:hi][ranked]:
+                name = self.names[idx]
+                if name not in matches:
+                    matches.append(name)
+                if len(matches) == limit:
+                    break
+
+            return matches
+
+        close = difflib.get_close_matches(key, self.short_names.keys(), n=limit, cutoff=0.6)
+
+        return [self.short_names[c] for c in close]
+
+
+def burst_triggers(tables):
+    """{name: trigger ID, or None} over the names and trigger IDs of a {table: DataFrame} mapping."""
+
+    triggers = {}
+
+    for df in tables.values():
+        for name in df['GRBname'].unique():
+            triggers.setdefault(str(name), None)
+
+        rows = df[['GRBname', 'Trig_ID']].dropna().drop_duplicates('GRBname')
+        for name, trig in zip(rows['GRBname'], rows['Trig_ID']):
+            if triggers[str(name)] is None:
+                triggers[str(name)] = int(trig)
+
+    return triggers
+
+def search_index_from_triggers(triggers):
+    """NameSearchIndex from a {name: trigger ID, or None} mapping, e.g. the 'bursts' of a dataset manifest."""
+    return NameSearchIndex(triggers, {name: trig for name, trig in triggers.items() if trig is not None})
+
+def build_search_index(tables):
+    """NameSearchIndex over the names and trigger IDs of a {table: DataFrame} mapping."""
+    return search_index_from_triggers(burst_triggers(tables))
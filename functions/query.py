@@ -0,0 +1,411 @@
+import os
+import ast
+import sys
+import argparse
+import operator
+import numpy as np
+import pandas as pd
+
+from functions.ingest import TABLES, TABLE_SCHEMAS, is_numeric_column, load_table, load_ragged
+from functions.features import log_column, converted_fluence
+from functions.bursts import widen_floats
+
+###############################################################################
+### FILTER EXPRESSIONS
+
+class QueryError(ValueError):
+    pass
+
+
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+# no ** : constant powers such as 9**9**9 are evaluated by Python and never finish
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+_ALLOWED = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+            ast.Compare, ast.In, ast.NotIn, ast.BinOp, ast.Name, ast.Load, ast.Constant, ast.List, ast.Tuple,
+            *_COMPARE, *_BINARY)
+
+# comparisons that pyarrow can apply while reading, and their mirror image for
+# "value op column"; != is left out because pyarrow drops nulls where pandas keeps NaN
+_PUSHDOWN = {ast.Eq: '==', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.In: 'in'}
+_MIRRORED = {'==': '==', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+# filters come from API query strings too, so their size is bounded before parsing
+MAX_FILTER_LENGTH = 1000
+MAX_FILTER_NODES = 200
+
+
+def parse_filter(expression):
+    """Parse a filter such as "e_iso > 1e52 and flare_count >= 2".
+
+    Supports comparisons (chained too), and/or/not, arithmetic, and `in` with a
+    list of literals. Anything else, such as calls or attribute access, is rejected,
+    as are filters longer than MAX_FILTER_LENGTH characters or MAX_FILTER_NODES nodes.
+    """
+
+    if len(expression) > MAX_FILTER_LENGTH:
+        raise QueryError(f"filter expression too long (over {MAX_FILTER_LENGTH} characters)")
+
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise QueryError(f"invalid filter expression: {e.msg}") from None
+
+    for i, node in enumerate(ast.walk(tree)):
+        if i >= MAX_FILTER_NODES:
+            raise QueryError(f"filter expression too complex (over {MAX_FILTER_NODES} nodes)")
+        if not isinstance(node, _ALLOWED):
+            raise QueryError(f"unsupported syntax in filter: {type(node).__name__}")
+
+    return tree
+
+def filter_columns(tree):
+    """Column names referenced by a parsed filter."""
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+def _literal(node):
+
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(e) for e in node.elts]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _literal(node.operand)
+        if isinstance(value, (int, float)):
+            return -value
+
+    raise QueryError("expected a literal value")
+
+def _as_stored(value, dtype):
+    """A literal rounded to a column's dtype: float32 columns hold the nearest float32
+    to each CSV value, which the float64 literal 8.836 would never equal."""
+
+    if isinstance(value, list):
+        return [_as_stored(v, dtype) for v in value]
+    if dtype == 'float32' and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return np.float32(value)
+
+    return value
+
+def _evaluate(node, df):
+
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, df)
+
+    if isinstance(node, ast.Name):
+        return df[node.id]
+
+    if isinstance(node, (ast.Constant, ast.List, ast.Tuple)):
+        return _literal(node)
+
+    if isinstance(node, ast.BoolOp):
+        values = [_as_mask(_evaluate(v, df), df) for v in node.values]
+        combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+        result = values[0]
+        for v in values[1:]:
+            result = combine(result, v)
+        return result
+
+    if isinstance(node, ast.UnaryOp):
+        value = _evaluate(node.operand, df)
+        if isinstance(node.op, ast.Not):
+            return ~_as_mask(value, df)
+        return -value if isinstance(node.op, ast.USub) else value
+
+    if isinstance(node, ast.BinOp):
+        operands = [_evaluate(node.left, df), _evaluate(node.right, df)]
+        # arithmetic on numbers and columns only: "x" * 10**9 and [0] * 10**9 would allocate gigabytes
+        if any(isinstance(v, (str, bool, list)) for v in operands):
+            raise QueryError("arithmetic needs numbers or columns")
+        return _BINARY[type(node.op)](*operands)
+
+    if isinstance(node, ast.Compare):
+        result = None
+        left = _evaluate(node.left, df)
+
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, df)
+            a = _as_stored(left, right.dtype) if isinstance(right, pd.Series) else left
+            b = _as_stored(right, left.dtype) if isinstance(left, pd.Series) else right
+
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(a, pd.Series):
+                    raise QueryError("`in` needs a column on the left")
+                mask = a.isin(b if isinstance(b, list) else [b])
+                mask = ~mask if isinstance(op, ast.NotIn) else mask
+            else:
+                mask = _COMPARE[type(op)](a, b)
+
+            mask = _as_mask(mask, df)
+            result = mask if result is None else result & mask
+            left = right
+
+        return result
+
+    raise QueryError(f"unsupported syntax in filter: {type(node).__name__}")
+
+def _as_mask(value, df):
+
+    if isinstance(value, pd.Series):
+        return value.fillna(False).astype(bool)
+
+    return pd.Series(bool(value), index=df.index)
+
+def evaluate_filter(tree, df):
+    """Boolean mask of the rows of `df` matching a parsed filter; missing values never match."""
+
+    try:
+        return _as_mask(_evaluate(tree, df), df).to_numpy()
+    except (TypeError, ArithmeticError) as e:
+        raise QueryError(f"cannot evaluate filter: {e}") from None
+
+def pushdown_filters(tree, table, columns):
+    """Top-level `column op literal` conditions of a filter, as pyarrow read filters.
+
+    Only conditions joined by `and` are pushed down; the full filter is still
+    applied after reading, so these just let Parquet skip rows early.
+    """
+
+    body = tree.body
+    conditions = body.values if isinstance(body, ast.BoolOp) and isinstance(body.op, ast.And) else [body]
+    filters = []
+
+    for cond in conditions:
+        if not (isinstance(cond, ast.Compare) and len(cond.ops) == 1 and type(cond.ops[0]) in _PUSHDOWN):
+            continue
+
+        op = _PUSHDOWN[type(cond.ops[0])]
+        left, right = cond.left, cond.comparators[0]
+
+        if not isinstance(left, ast.Name) and isinstance(right, ast.Name) and op in _MIRRORED:
+            left, right, op = right, left, _MIRRORED[op]
+
+        if not isinstance(left, ast.Name) or left.id not in columns:
+            continue
+
+        try:
+            value = _literal(right)
+        except QueryError:
+            continue
+
+        # only push down values of the column's type, leaving mismatches to raise in pandas
+        if (op == 'in') != isinstance(value, list):
+            continue
+        numeric = is_numeric_column(table, left.id)
+        values = value if isinstance(value, list) else [value]
+        if not values or any((isinstance(v, (int, float)) and not isinstance(v, bool)) != numeric for v in values):
+            continue
+
+        filters.append((left.id, op, _as_stored(value, TABLE_SCHEMAS[table][left.id])))
+
+    return filters
+
+
+###############################################################################
+### DERIVED COLUMNS
+
+def _burst_counts(source, table, df):
+    names = _load(source, table, ['GRBname'])['GRBname']
+    return df['GRBname'].map(names.value_counts()).fillna(0).astype('int64')
+
+def _afterglow_fluence(source, table, df):
+    return converted_fluence(_ragged(source, table, df)['fluence'], df['conversion'])
+
+# table: {column: (columns it is computed from, needs every row in table order, builder)}
+DERIVED_COLUMNS = {
+    'afterglow': {
+        'afterglow_fluence': (['fluence', 'conversion'], True, _afterglow_fluence),
+    },
+    'flares': {
+        'flare_count': (['GRBname'], False, lambda source, table, df: _burst_counts(source, 'flares', df)),
+        'pulse_count': (['GRBname'], False, lambda source, table, df: _burst_counts(source, 'pulses', df)),
+    },
+    'pulses': {
+        'flare_count': (['GRBname'], False, lambda source, table, df: _burst_counts(source, 'flares', df)),
+        'pulse_count': (['GRBname'], False, lambda source, table, df: _burst_counts(source, 'pulses', df)),
+    },
+}
+
+def available_columns(table):
+    """Every column a query on `table` can use: stored, derived, and `<numeric column>_log`."""
+
+    schema = TABLE_SCHEMAS[table]
+    derived = list(DERIVED_COLUMNS[table])
+    numeric = [c for c in schema if is_numeric_column(table, c)] + derived
+
+    return list(schema) + derived + [f'{c}_log' for c in numeric]
+
+def _resolve(table, names):
+    """Stored columns to read, derived columns to build in order, and whether all rows are needed."""
+
+    schema = TABLE_SCHEMAS[table]
+    derived = DERIVED_COLUMNS[table]
+    stored, build, full_rows = {'GRBname'}, [], False
+
+    def visit(name):
+        nonlocal full_rows
+
+        if name in schema:
+            stored.add(name)
+        elif name in derived:
+            base, needs_all, _ = derived[name]
+            for b in base:
+                visit(b)
+            full_rows |= needs_all
+            if name not in build:
+                build.append(name)
+        elif name.endswith('_log') and name[:-4] in available_columns(table):
+            visit(name[:-4])
+            if name not in build:
+                build.append(name)
+        else:
+            raise QueryError(f"unknown column '{name}' for table '{table}'")
+
+    for name in names:
+        visit(name)
+
+    return ['GRBname'] + sorted(stored - {'GRBname'}), build, full_rows
+
+
+###############################################################################
+### QUERY
+
+def _load(source, table, columns, filters=None):
+
+    if hasattr(source, 'columns'): # a dataset from functions.dataset_store
+        return source.columns(table, columns)
+
+    return load_table(source, table, columns, filters)
+
+def _ragged(source, table, df):
+
+    if hasattr(source, 'ragged'):
+        return source.ragged(table)
+
+    return load_ragged(source, table, df)
+
+def query(source, table, where=None, columns=None, sort=None, descending=False, limit=None):
+    """Rows of a results table matching a filter expression.
+
+    `source` is a dataset folder path, or a dataset from functions.dataset_store
+    to reuse its loaded tables. Only the columns used by the projection, filter
+    and sort are read, and simple `and`-ed conditions are applied while reading
+    the Parquet cache. Derived columns (see `available_columns`) can be used like
+    stored ones.
+    """
+
+    if table not in TABLES:
+        raise QueryError(f"unknown table '{table}', expected one of {', '.join(TABLES)}")
+
+    tree = parse_filter(where) if where and where.strip() else None
+    columns = list(columns) if columns else list(TABLE_SCHEMAS[table])
+
+    needed = set(columns) | (filter_columns(tree) if tree else set()) | ({sort} if sort else set())
+    stored, build, full_rows = _resolve(table, needed)
+
+    filters = pushdown_filters(tree, table, stored) if tree is not None and not full_rows else None
+    df = _load(source, table, stored, filters)
+
+    for name in build:
+        if name in DERIVED_COLUMNS[table]:
+            df[name] = DERIVED_COLUMNS[table][name][2](source, table, df)
+        else:
+            df[name] = log_column(pd.to_numeric(df[name[:-4]], errors='coerce'))
+
+    if tree is not None:
+        df = df[evaluate_filter(tree, df)]
+
+    if sort:
+        df = df.sort_values(sort, ascending=not descending, kind='stable')
+
+    if limit is not None:
+        df = df.head(limit)
+
+    return df[columns].reset_index(drop=True)
+
+
+###############################################################################
+### CLI
+
+OUTPUT_FORMATS = ('table', 'csv', 'json', 'parquet')
+
+def write_result(df, fmt, output=None):
+
+    if fmt == 'parquet':
+        df.to_parquet(output or sys.stdout.buffer, index=False)
+        return
+
+    if fmt == 'csv':
+        text = df.to_csv(index=False)
+    elif fmt == 'json':
+        text = widen_floats(df).to_json(orient='records', indent=1) + '\n'
+    else:
+        text = widen_floats(df).to_string(index=False) + '\n'
+
+    if output:
+        with open(output, 'w') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+def resolve_dataset(name=None):
+    """Dataset folder from a path or a folder name in results/; the newest dataset if not given."""
+
+    from functions.catalogue import list_datasets, dataset_path
+
+    if name is None:
+        datasets = list_datasets()
+        if not datasets:
+            raise QueryError("no datasets found in results/")
+        return dataset_path(datasets[0])
+
+    if os.path.isdir(name):
+        return name
+
+    if os.path.isdir(dataset_path(name)):
+        return dataset_path(name)
+
+    raise QueryError(f"dataset '{name}' not found")
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='python -m functions.query',
+                                     description="Query the LAFF results tables without starting the viewer.")
+    parser.add_argument('table', choices=TABLES)
+    parser.add_argument('where', nargs='?', default=None, help='filter expression, e.g. "e_iso > 1e52 and flare_count >= 2"')
+    parser.add_argument('-d', '--dataset', default=None, help="dataset folder or name in results/ (default: newest)")
+    parser.add_argument('-c', '--columns', default=None, help="comma-separated columns to output (default: all stored columns)")
+    parser.add_argument('-s', '--sort', default=None, help="column to sort by")
+    parser.add_argument('--desc', action='store_true', help="sort descending")
+    parser.add_argument('-n', '--limit', type=int, default=None, help="maximum number of rows")
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='table')
+    parser.add_argument('-o', '--output', default=None, help="output file (default: stdout)")
+    parser.add_argument('--count', action='store_true', help="only print the number of matching rows")
+    parser.add_argument('--list-columns', action='store_true', help="list the columns available for the table")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.list_columns:
+        print('\n'.join(available_columns(args.table)))
+        return 0
+
+    try:
+        columns = [c.strip() for c in args.columns.split(',') if c.strip()] if args.columns else None
+        df = query(resolve_dataset(args.dataset), args.table, args.where, columns, args.sort, args.desc, args.limit)
+    except QueryError as e:
+        parser.exit(2, f"error: {e}\n")
+
+    if args.count:
+        print(len(df))
+    else:
+        write_result(df, args.format, args.output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import re
+import numpy as np
+
+###############################################################################
+### RAGGED ARRAYS
+
+# brackets and parentheses of the stringified lists/tuples written by LAFF
+_NESTING = re.compile(r'[\[\]()]')
+
+
+def _parse_token(token):
+    token = token.strip()
+    if token in ('nan', 'None', ''):
+        return np.nan
+    return float(token)
+
+
+class RaggedArray:
+    """Variable-length rows stored as one flat values array plus row offsets.
+
+    Row i is values[offsets[i]:offsets[i+1]]. Rows are addressed by position in
+    the table they were parsed from, i.e. the RangeIndex label of the loaded frame.
+    """
+
+    def __init__(self, values, offsets):
+        self.values = np.asarray(values, dtype='float64')
+        self.offsets = np.asarray(offsets, dtype='int64')
+
+    @classmethod
+    def from_strings(cls, strings):
+        """Parse stringified (possibly nested) lists, flattening each row.
+
+        Nested rows are flattened in order, so the afterglow fluence tuple
+        "(total, [c1, c2])" becomes [total, c1, c2].
+        """
+
+        rows = []
+        for s in strings:
+            tokens = _NESTING.sub('', s).split(',') if isinstance(s, str) else []
+            rows.append([_parse_token(t) for t in tokens if t.strip()])
+
+        lengths = np.fromiter((len(r) for r in rows), dtype='int64', count=len(rows))
+        offsets = np.zeros(len(rows) + 1, dtype='int64')
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter((v for r in rows for v in r), dtype='float64', count=offsets[-1])
+
+        return cls(values, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self.values[self.offsets[row]:self.offsets[row + 1]]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def take(self, rows):
+        """Return a new RaggedArray holding only the given row positions."""
+
+        rows = np.asarray(rows, dtype='int64')
+        starts, stops = self.offsets[rows], self.offsets[rows + 1]
+        lengths = stops - starts
+
+        offsets = np.zeros(len(rows) + 1, dtype='int64')
+        np.cumsum(lengths, out=offsets[1:])
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+
+        return RaggedArray(self.values[index], offsets)
+
+    def column(self, position, fill=np.nan):
+        """Element `position` of every row as a flat array, `fill` where a row is too short."""
+
+        out = np.full(len(self), fill, dtype='float64')
+        has_value = self.lengths > position
+        out[has_value] = self.values[self.offsets[:-1][has_value] + position]
+
+        return out
+
+    def to_lists(self):
+        return [self[i].tolist() for i in range(len(self))]
@@ -0,0 +1,98 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+from functions.density import axis_values
+
+###############################################################################
+### PLOT SELECTIONS
+
+SELECTION_QUANTILES = {'Min': 0.0, '25%': 0.25, 'Median': 0.5, '75%': 0.75, 'Max': 1.0}
+
+
+def in_polygon(x, y, px, py):
+    """Points (x, y) inside the polygon with vertices (px, py), by even-odd ray casting.
+
+    With the points sorted by y, the ones level with an edge are a contiguous
+    slice, so each edge only tests those rather than every point.
+    """
+
+    order = np.argsort(y, kind='stable')
+    xs, ys = x[order], y[order]
+    inside = np.zeros(len(x), dtype=bool)
+
+    for x0, y0, x1, y1 in zip(px, py, np.roll(px, 1), np.roll(py, 1)):
+        if y0 == y1:
+            continue
+
+        # the edge crosses the horizontal ray of points with min(y0, y1) <= y < max(y0, y1)
+        lo, hi = np.searchsorted(ys, (min(y0, y1), max(y0, y1)))
+        inside[lo:hi] ^= xs[lo:hi] < (x1 - x0) * (ys[lo:hi] - y0) / (y1 - y0) + x0
+
+    selected = np.empty(len(x), dtype=bool)
+    selected[order] = inside
+    return selected
+
+def region_mask(x, y, boxes=(), lassos=()):
+    """Points inside any of the box or lasso regions of a plotly selection event ({'x': [...], 'y': [...]} each).
+
+    `x` and `y` are in the plot's axis coordinates, e.g. from axis_values; NaNs are never selected.
+    """
+
+    mask = np.zeros(len(x), dtype=bool)
+
+    for region in boxes:
+        (x0, x1), (y0, y1) = sorted(region['x']), sorted(region['y'])
+        mask |= (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+
+    for region in lassos:
+        px, py = np.asarray(region['x'], dtype='float64'), np.asarray(region['y'], dtype='float64')
+
+        # only points in the lasso's bounding box are tested against its edges
+        candidates = np.flatnonzero((x >= px.min()) & (x <= px.max()) & (y >= py.min()) & (y <= py.max()))
+        mask[candidates[in_polygon(x[candidates], y[candidates], px, py)]] = True
+
+    return mask
+
+def selection_stats(df, columns, population_medians=None):
+    """Count and quantiles of each of `columns` {label: column} over the rows of `df`, one row per parameter.
+
+    `population_medians` (from column_medians, e.g. of the whole population) are added for comparison.
+    """
+
+    labels = list(columns)
+    values = np.column_stack([axis_values(df[c], False) for c in columns.values()])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # parameters missing from every selected row
+        quantiles = np.nanquantile(values, list(SELECTION_QUANTILES.values()), axis=0) if len(values) else \
+            np.full((len(SELECTION_QUANTILES), len(labels)), np.nan)
+
+    stats = pd.DataFrame(quantiles.T, index=labels, columns=list(SELECTION_QUANTILES))
+    stats.insert(0, 'N', np.isfinite(values).sum(axis=0))
+
+    if population_medians is not None:
+        stats['Population median'] = population_medians
+
+    return stats
+
+def column_medians(df, columns):
+    values = np.column_stack([axis_values(df[c], False) for c in columns.values()])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmedian(values, axis=0)
+
+def burst_counts(df, by=None):
+    """Selected rows per burst, most first; with `by` (e.g. 'Type') one column per value."""
+
+    names = df['GRBname'].astype(str)
+
+    if by is None:
+        counts = names.value_counts().rename('Points').to_frame()
+    else:
+        counts = pd.crosstab(names, df[by].astype(str))
+        counts = counts.loc[counts.sum(axis=1).sort_values(ascending=False, kind='stable').index]
+
+    counts.index.name = 'GRB'
+    return counts
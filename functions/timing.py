@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import logging
+import threading
+from functools import wraps
+
+###############################################################################
+### TIMING SPANS
+
+ENV_VAR = 'LAFF_PERF'
+
+logger = logging.getLogger('laff.perf')
+_local = threading.local()
+
+
+class _NullSpan:
+    """Shared do-nothing span, returned whenever no rerun is being recorded."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+
+    __slots__ = ('recorder', 'name', 'fields', 'start', 'depth')
+
+    def __init__(self, recorder, name, fields):
+        self.recorder = recorder
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.depth = self.recorder.depth
+        self.recorder.depth += 1
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.recorder.depth -= 1
+        self.recorder.spans.append({
+            'name': self.name,
+            'start_ms': (self.start - self.recorder.start) * 1e3,
+            'ms': (end - self.start) * 1e3,
+            'depth': self.depth,
+            **self.fields,
+        })
+        return False
+
+
+class Recorder:
+    """Spans recorded during one script run, in the thread running it."""
+
+    def __init__(self, **context):
+        self.context = context
+        self.spans = []
+        self.depth = 0
+        self.start = time.perf_counter()
+        self.total_ms = None
+
+    def ordered(self):
+        """Spans in the order they started, so nested spans follow their parent."""
+        return sorted(self.spans, key=lambda s: (s['start_ms'], s['depth']))
+
+    def to_json(self):
+        return json.dumps({'event': 'rerun', **self.context, 'total_ms': self.total_ms, 'spans': self.ordered()}, default=str)
+
+
+def env_enabled():
+    return os.environ.get(ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no')
+
+def start(**context):
+    """Record spans in this thread until `stop`; `context` is added to the log record."""
+
+    _local.recorder = Recorder(**context)
+    return _local.recorder
+
+def stop(**context):
+    """Stop recording, log the rerun as one JSON line and return its recorder (None if not recording)."""
+
+    recorder = getattr(_local, 'recorder', None)
+    _local.recorder = None
+
+    if recorder is not None:
+        recorder.total_ms = (time.perf_counter() - recorder.start) * 1e3
+        recorder.context.update(context)
+        logger.info(recorder.to_json())
+
+    return recorder
+
+def span(name, **fields):
+    """Time a block: `with span('lookup', burst=name): ...`. Costs one attribute lookup when not recording."""
+
+    recorder = getattr(_local, 'recorder', None)
+
+    if recorder is None:
+        return _NULL_SPAN
+
+    return _Span(recorder, name, fields)
+
+def timed(name):
+    """Decorator form of `span`."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+def configure_logging():
+    """Send the JSON span records to stderr, once."""
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 
-from app import LENGTHS
+from functions.catalogue import get_dataset
 
 st.set_page_config(page_title="LAFF - About")
 
@@ -26,6 +26,8 @@ st.session_state['about_tab_selection'] = selected_tab
 ###############################################################################
 
 if selected_tab == 'Overview':
+
+    LENGTHS = get_dataset(st.session_state['dataset_folder']).lengths
     
     st.markdown(f"""
                 Lightcurve and Flare Fitter (LAFF) is a Python-based data pipeline, written as part of my PhD at the University of Leicester. It is an open source tool for the gamma-ray burst (GRB) community to provide hte automated fitting of *Swift* GRB light curves. Originally insprired by the afterglow fitter of the [*Swift*-XRT GRB Catalogue](https://www.swift.ac.uk/xrt_live_cat/), this code extends the functionality by providing modelling of the flare components, on top of identifying the underlying afterglow. Additionally, there is an algorthim for the BAT data to identify and fit gamma-ray pulses. This allows for the complete temporal modelling across the X-ray and gamma-ray regime of every GRB from entirety of the *Swift* mission.
@@ -1,13 +1,19 @@
 import streamlit as st
 import pandas as pd
-import os
-import ast
 
-from app import name_options, tab_afterglow, tab_flares, tab_pulses, dataset_path
-from functions.main_functions import get_table_multiple_values, get_table_value, get_table_list, get_converted_fluence, print_grb_name
+from functions.catalogue import get_dataset
+from functions.main_functions import get_table_multiple_values, get_table_value, get_table_list, get_converted_fluence, print_grb_name, xrt_model_figure, bat_model_figure, export_panel
+from functions.name_index import lookup_rows
+from functions.images import figure_html
+from functions.timing import span
 
 st.set_page_config(page_title="LAFF - Burst Viewer")
 
+# tables are only loaded once a burst is shown; the search box needs just the names
+dataset = get_dataset(st.session_state['dataset_folder'])
+name_options = dataset.name_options
+search_index = dataset.search_index
+
 ###############################################################################
 ### SEARCH PROMPT
 
@@ -18,33 +24,66 @@ current_grb = st.session_state['viewer_grb']
 current_index = name_options.index(current_grb) if current_grb in name_options else None
 
 search_query = st.selectbox("Enter GRB Name:", name_options, index=current_index,
-                            placeholder='Enter GRB Name', label_visibility='collapsed',
-                            key='burst_viewer_entry')
+                            placeholder='Enter GRB Name or Trigger ID', label_visibility='collapsed',
+                            accept_new_options=True, key='burst_viewer_entry')
+
+def select_suggestion(name):
+    st.session_state['viewer_grb'] = print_grb_name(name)
+    del st.session_state['burst_viewer_entry'] # re-create the selectbox at the new index
 
 
 ###############################################################################
 ### SEARCH HANDLING
 
 if search_query:
-    
-    st.session_state['viewer_grb'] = search_query
-    
-    search_query = search_query.strip().upper()
-    search_query = search_query.replace(" ", "")
-    search_query = search_query if search_query.startswith("GRB") else "GRB" + search_query
-    search_query = search_query if search_query[-1].isalpha() else search_query + "A"
+
+    with span('resolve'):
+        resolved_name = search_index.resolve(search_query)
+
+    if resolved_name is None:
+        # a trigger ID shared by several bursts resolves to none of them
+        suggestions = search_index.candidates(search_query)
+
+        if suggestions:
+            st.warning(f"'{search_query}' matches several bursts.")
+        else:
+            st.warning(f"No data found for '{search_query}'.")
+            suggestions = search_index.query(search_query, limit=8)
+
+        if suggestions:
+            st.markdown("Did you mean:")
+            suggestion_cols = st.columns(len(suggestions))
+            for col, name in zip(suggestion_cols, suggestions):
+                with col:
+                    st.button(print_grb_name(name), key=f"suggestion_{name}", on_click=select_suggestion, args=(name,))
+
+        st.stop()
+
+    search_query = resolved_name
+    st.session_state['viewer_grb'] = print_grb_name(search_query)
 
     st.set_page_config(page_title=f"LAFF - {print_grb_name(search_query)}")
 
 
-    afterglow = tab_afterglow[tab_afterglow['GRBname'].str.upper() == search_query]
-    flares = tab_flares[tab_flares['GRBname'].str.upper() == search_query]
-    pulses = tab_pulses[tab_pulses['GRBname'].str.upper() == search_query]
+    name_index = dataset.name_index
+    rag_afterglow = dataset.ragged('afterglow')
+    rag_flares = dataset.ragged('flares')
+    figure_manifest = dataset.figure_manifest
+
+    with span('lookup', burst=search_query):
+        afterglow = lookup_rows(dataset.afterglow, name_index['afterglow'], search_query)
+        flares = lookup_rows(dataset.flares, name_index['flares'], search_query)
+        pulses = lookup_rows(dataset.pulses, name_index['pulses'], search_query)
     
 
     if not all([afterglow.empty, flares.empty, pulses.empty]):
 
-        st.header(f"{print_grb_name(search_query)}")
+        header_col, export_col = st.columns([0.85, 0.15], vertical_alignment='bottom')
+
+        with header_col:
+            st.header(f"{print_grb_name(search_query)}")
+        with export_col:
+            export_panel({'afterglow': afterglow, 'flares': flares, 'pulses': pulses}, dataset, search_query, key='viewer_export')
 
         ###############################################################################
         ### SUMMARY TABLE
@@ -54,7 +93,7 @@ if search_query:
         summary_data_left = {
             "T90 (s)": get_table_value(afterglow, 'T90', error="T90_err"),
             "Redshift": get_table_value(afterglow, 'redshift', error="redshift_err", format="%.2g"),
-            "Afterglow Fluence (erg cm$^{-2}$)": get_converted_fluence(afterglow, 'fluence', 'conversion'),
+            "Afterglow Fluence (erg cm$^{-2}$)": get_converted_fluence(afterglow, rag_afterglow['fluence'], 'conversion'),
         }
 
         summary_data_right = {
@@ -80,6 +119,11 @@ if search_query:
 
         st.markdown(":grey[:small[See [About LAFF](/about_laff) for a description of the model parameters, and the fitting procedure.]]")
 
+        plot_mode = st.segmented_control("Light curves", ["Interactive model", "Fit image"], default="Interactive model",
+                                         selection_mode='single', key='viewer_plot_mode',
+                                         help="Interactive plots are drawn from the fitted LAFF parameters; images show the fit against the data.")
+        interactive = plot_mode != "Fit image"
+
         st.divider()
 
 
@@ -88,13 +132,18 @@ if search_query:
 
         st.subheader("Swift-BAT")
 
-        bat_image_path = os.path.join(dataset_path, "figures/bat", f"{search_query}.png")
+        with span('figure_html', instrument='bat'):
+            bat_image = figure_html(figure_manifest, dataset.path, 'bat', search_query, f"BAT fit of {search_query}")
 
         bat_plot, bat_table = st.columns([0.6, 0.4], border=True, vertical_alignment='center')
 
         with bat_plot:
-            if os.path.exists(bat_image_path):
-                st.image(bat_image_path, width='stretch')
+            if interactive and len(pulses):
+                with span('model_figure', instrument='bat'):
+                    st.plotly_chart(bat_model_figure(pulses), width='stretch', theme=None)
+            elif bat_image:
+                with span('image', instrument='bat'):
+                    st.markdown(bat_image, unsafe_allow_html=True)
             else:
                 st.error("No BAT fit for this burst.")
 
@@ -163,13 +212,22 @@ if search_query:
             st.info("No XRT fit for this burst.")
         else:
 
-            xrt_image_path = os.path.join(dataset_path, "figures/xrt", f"{search_query}.png")
+            with span('figure_html', instrument='xrt'):
+                xrt_image = figure_html(figure_manifest, dataset.path, 'xrt', search_query, f"XRT fit of {search_query}")
 
             xrt_plot, xrt_table = st.columns([0.6, 0.4], border=True, vertical_alignment='center')
 
             with xrt_plot:
-                if os.path.exists(xrt_image_path):
-                    st.image(xrt_image_path, width='stretch')
+                if interactive and not afterglow.empty:
+                    with span('model_figure', instrument='xrt'):
+                        flare_params = rag_flares['params'].take(flares.index)
+                        fig = xrt_model_figure(get_table_list(afterglow, rag_afterglow['slopes']),
+                                               get_table_list(afterglow, rag_afterglow['breaks']),
+                                               afterglow['normal'].iloc[0], flare_params, flares['flarenum'])
+                        st.plotly_chart(fig, width='stretch', theme=None)
+                elif xrt_image:
+                    with span('image', instrument='xrt'):
+                        st.markdown(xrt_image, unsafe_allow_html=True)
                 else:
                     st.error("No XRT fit for this burst.")
 
@@ -187,18 +245,18 @@ if search_query:
                     fmt = "%.3g"
 
                     with slp_val:
-                        slopes = get_table_list(afterglow, 'slopes')
+                        slopes = get_table_list(afterglow, rag_afterglow['slopes'])
                         for v in slopes:
                             st.markdown(f"{fmt % v}")
                     with slp_err:
-                        slopes_err = get_table_list(afterglow, 'slopes_err')
+                        slopes_err = get_table_list(afterglow, rag_afterglow['slopes_err'])
                         for e in slopes_err:
                             st.markdown(rf"($\pm$ {fmt % e})")
 
                 with breaks_col:
 
-                    breaks = get_table_list(afterglow, 'breaks')
-                    breaks_err = get_table_list(afterglow, 'breaks_err')
+                    breaks = get_table_list(afterglow, rag_afterglow['breaks'])
+                    breaks_err = get_table_list(afterglow, rag_afterglow['breaks_err'])
 
                     st.markdown("**Break Times (s)**")
                     
@@ -221,7 +279,7 @@ if search_query:
                 total_flare_fluence =  "%.3g" % sum([x for x in flares['fluence']]) if len(flares['fluence']) else "-"
 
                 summary_data = {
-                    "Afterglow fluence (erg/cm^2)": get_converted_fluence(afterglow, 'fluence', 'conversion'),
+                    "Afterglow fluence (erg/cm^2)": get_converted_fluence(afterglow, rag_afterglow['fluence'], 'conversion'),
                     "Total flare fluence (erg/cm^2)": total_flare_fluence,
                     }
 
@@ -250,15 +308,15 @@ if search_query:
                     "L_iso (erg/s)": get_table_multiple_values(flares, 'L_iso'),
                     })
 
-                flare_params = [ast.literal_eval(x) for x in flares['params']]
+                flare_params = rag_flares['params'].take(flares.index)
 
                 flare_table_model = pd.DataFrame({
                     "Flare Number": get_table_multiple_values(flares, 'flarenum', format='%d'),                    
-                    "t_peak": [x[0] for x in flare_params],
-                    "rise": [x[1] for x in flare_params],
-                    "decay": [x[2] for x in flare_params],
-                    "sharpness": [x[3] for x in flare_params],
-                    "amplitude": [x[4] for x in flare_params],
+                    "t_peak": flare_params.column(0),
+                    "rise": flare_params.column(1),
+                    "decay": flare_params.column(2),
+                    "sharpness": flare_params.column(3),
+                    "amplitude": flare_params.column(4),
                 })
             
                 st.space()
@@ -0,0 +1,97 @@
+import streamlit as st
+
+from functions.catalogue import dataset_labels, get_dataset
+from functions.diff import KEY_COLUMNS, STATUSES, release_diff, status_counts, column_change_counts, burst_summary
+
+st.set_page_config(page_title="LAFF - Compare Releases")
+
+st.title("Compare Releases")
+
+TABLE_TITLES = {'afterglow': "Afterglows", 'flares': "Flares", 'pulses': "Pulses"}
+
+###############################################################################
+### RELEASE SELECTION
+
+labels = dataset_labels()
+options = list(labels.keys())
+
+if len(options) < 2:
+    st.info("Only one LAFF release is available. Add another dataset folder to `results/` to compare releases.")
+    st.stop()
+
+old_col, new_col = st.columns(2)
+
+with old_col:
+    old_label = st.selectbox("Older release", options, index=1, key='compare_old')
+with new_col:
+    new_label = st.selectbox("Newer release", options, index=0, key='compare_new')
+
+if old_label == new_label:
+    st.warning("Select two different releases.")
+    st.stop()
+
+with st.spinner("Comparing releases..."):
+    diffs = release_diff(get_dataset(labels[old_label]), get_dataset(labels[new_label]))
+    summary = burst_summary(diffs)
+
+
+###############################################################################
+### OVERVIEW
+
+metric_cols = st.columns(len(diffs) + 1, border=True)
+
+with metric_cols[0]:
+    st.metric("Bursts changed", int(summary['any_change'].sum()), help=f"of {len(summary)} bursts in either release")
+
+for col, (table, diff) in zip(metric_cols[1:], diffs.items()):
+    counts = status_counts(diff)
+    with col:
+        st.metric(TABLE_TITLES[table], f"{counts['changed']} changed",
+                  delta=f"+{counts['added']} / -{counts['removed']}", delta_color='off')
+
+st.divider()
+
+
+###############################################################################
+### PER BURST
+
+st.subheader("Bursts")
+
+show_all = st.toggle("Include unchanged bursts", value=False, key='compare_show_all')
+burst_rows = summary if show_all else summary[summary['any_change']]
+
+st.dataframe(burst_rows.drop(columns='any_change'), hide_index=True, width='stretch')
+
+st.divider()
+
+
+###############################################################################
+### PER TABLE
+
+st.subheader("Parameters")
+
+table = st.segmented_control("Table", list(diffs), default='afterglow', format_func=TABLE_TITLES.get,
+                             selection_mode='single', key='compare_table') or 'afterglow'
+diff = diffs[table]
+
+counts_col, rows_col = st.columns([0.3, 0.7])
+
+with counts_col:
+    st.markdown("**Rows changed per column**")
+    change_counts = column_change_counts(diff)
+    if len(change_counts):
+        st.bar_chart(change_counts, horizontal=True)
+    else:
+        st.text("No parameter changes.")
+
+with rows_col:
+    statuses = st.multiselect("Status", STATUSES, default=['added', 'removed', 'changed'], key=f'compare_status_{table}')
+
+    keys = list(KEY_COLUMNS[table])
+    rows = diff[diff['status'].isin(statuses)]
+
+    columns = st.multiselect("Columns", list(change_counts.index), default=list(change_counts.index[:3]),
+                             key=f'compare_columns_{table}', placeholder="Choose parameters to show")
+    shown = keys + ['status', 'changed_columns'] + [f'{c}_{s}' for c in columns for s in ('old', 'new', 'delta') if f'{c}_{s}' in diff]
+
+    st.dataframe(rows[shown], hide_index=True, width='stretch')
@@ -1,39 +1,32 @@
-import ast
+import os
 import streamlit as st
-import numpy as np
-import pandas as pd
 
-from app import tab_afterglow, tab_flares, tab_pulses
-from functions.main_functions import population_afterglow, population_flares
+from functions.catalogue import get_dataset
+from functions.features import PARAM_SETTINGS, FEATURES_VERSION, settings_key, afterglow_features, component_features, ComponentPopulation
+from functions.timing import span
+from functions.correlation import correlations
+from functions.main_functions import RENDER_MODES, PLOT_VIEWS, population_afterglow, population_flares, correlation_panel, export_panel
 
 st.set_page_config(page_title="LAFF - Population Statistics")
 
-PARAM_SETTINGS = {
-    # GENERAL
-    'T90': {'units': 's', 'log': True},
-    'redshift': {'log': False},
-    'dimple': {},
-
-    # FLARE SPECIFIC
-    'fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
-    'duration': {'units': 's', 'log': True},
-    't_peak': {'units': 's', 'log': True},
-    't_ratio': {},
-    'underlying_index': {},
-    
-    'peak_flux': {'units': 'erg\u2009cm<sup>-2</sup>\u2009s<sup>-1</sup>', 'log': True},
-    'e_iso': {'units': 'erg', 'log': True},
-    'L_p': {'units': 'erg\u2009s<sup>-1</sup>', 'log': True},
-    'L_iso': {'units': 'erg\u2009s<sup>-1</sup>', 'log': True},
-    
-    # AFTERGLOW SPECIFIC
-    'afterglow_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
-    'total_flare_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
-    'total_pulse_fluence': {'units': 'erg\u2009cm<sup>-2</sup>', 'log': True},
-    
-}
+def load_afterglow_features(dataset):
+    key = ('afterglow_features', FEATURES_VERSION, settings_key(PARAM_SETTINGS))
+    data = dataset.derived(key, lambda ds: afterglow_features(ds.table('afterglow'), ds.ragged('afterglow')['fluence'], PARAM_SETTINGS))
+    return data.copy(deep=False)
+
+def load_component_population(dataset):
+    """Flares and pulses combined once per dataset; shared and read-only, like the tables."""
+    key = ('component_population', FEATURES_VERSION, settings_key(PARAM_SETTINGS))
+    return dataset.derived(key, lambda ds: ComponentPopulation(component_features(ds.table('flares'), 'flarenum', PARAM_SETTINGS),
+                                                               component_features(ds.table('pulses'), 'pulse_num', PARAM_SETTINGS)))
+
+def load_correlations(dataset, population, data, plot_cols):
+    """Every correlation of the plotted parameters, computed once per dataset and population."""
+    key = ('correlations', population, FEATURES_VERSION, settings_key(PARAM_SETTINGS), tuple(plot_cols.values()))
+    return dataset.derived(key, lambda ds: correlations(data, plot_cols.values(), PARAM_SETTINGS))
 
-GRB_NAMES = sorted(list(set(tab_afterglow['GRBname']) | set(tab_flares['GRBname']) | set(tab_pulses['GRBname'])))
+dataset = get_dataset(st.session_state['dataset_folder'])
+GRB_NAMES = dataset.search_index.names
 
 st.title("Population Statistics")
 
@@ -43,6 +36,12 @@ if 'plotting_tab_choice' not in st.session_state:
 
 selected_dataset = st.segmented_control("Select population:", ["Afterglows", "Pulses/Flares"], width='stretch', default=st.session_state['plotting_tab_choice'], selection_mode='single')
 
+render_mode = st.sidebar.segmented_control("Plot rendering", RENDER_MODES, default="Auto", selection_mode='single', key='popstats_render_mode',
+                                            help="WebGL keeps large plots responsive; Auto switches to it above a point-count threshold.") or "Auto"
+
+plot_view = st.sidebar.segmented_control("Plot view", PLOT_VIEWS, default="Scatter", selection_mode='single', key='popstats_view',
+                                         help="Density bins the points into a heatmap with marginal histograms, keeping large populations readable.") or "Scatter"
+
 if selected_dataset is None:
     selected_dataset = st.session_state['plotting_tab_choice']
 
@@ -55,24 +54,8 @@ if selected_dataset != st.session_state['plotting_tab_choice']:
 
 if selected_dataset == 'Afterglows':
     
-    data = tab_afterglow.copy()
-    
-    def get_afterglow_fluence(x):
-        fluence, conversion = x
-        fluence = ast.literal_eval(fluence)[0]
-        return fluence * conversion
-    
-    data['afterglow_fluence'] = data.apply(lambda row: get_afterglow_fluence((row['fluence'], row['conversion'])), axis=1)
-    
-    data['dimple'] = pd.to_numeric(data['dimple'], errors='coerce').astype('Int64').astype('str')
-    data['breaknum'] = data['breaknum'].astype(str)
-    
-    data['T90_log']                 = np.log10(data['T90'].replace(0, np.nan))
-    data['redshift_log']            = np.log10(data['redshift'].replace(0, np.nan))
-    data['afterglow_fluence_log']   = np.log10(data['afterglow_fluence'].replace(0, np.nan))
-    data['total_flare_fluence_log'] = np.log10(data['total_flare_fluence'].replace(0, np.nan))
-    data['total_pulse_fluence_log'] = np.log10(data['total_pulse_fluence'].replace(0, np.nan))
-    
+    with span('features', table='afterglow'):
+        data = load_afterglow_features(dataset)
     
     plot_cols = {
         'T90': 'T90',
@@ -85,30 +68,21 @@ if selected_dataset == 'Afterglows':
         'Total Pulse Fluence': 'total_pulse_fluence',
         # 'Dimple': 'dimple',
     }
-    population_afterglow(data, plot_cols, PARAM_SETTINGS, GRB_NAMES)
+    rows, highlighted = population_afterglow(data, plot_cols, PARAM_SETTINGS, GRB_NAMES, dataset.key, render_mode, plot_view)
+
+    export_panel({'afterglow': dataset.afterglow.loc[rows.index]}, dataset, f"laff_{os.path.basename(dataset.path)}",
+                 key='popstats_export_afterglow', highlighted=highlighted)
+
+    with span('correlations', table='afterglow'):
+        corr = load_correlations(dataset, 'afterglow', data, plot_cols)
+    correlation_panel(corr, plot_cols, PARAM_SETTINGS, 'afterglow')
 
     
 ############################################################
 elif selected_dataset == 'Pulses/Flares':
     
-    flare_data = tab_flares.copy()
-    pulse_data = tab_pulses.copy()
-    
-    flare_data['dimple'] = pd.to_numeric(flare_data['dimple'], errors='coerce').astype('Int64').astype(str)
-    pulse_data['dimple'] = pd.to_numeric(pulse_data['dimple'], errors='coerce').astype('Int64').astype(str)
-    
-    flare_data['Pulse/Flare Number'] = flare_data['flarenum']
-    pulse_data['Pulse/Flare Number'] = pulse_data['pulse_num']
-    
-    flare_data['underlying_index'] = flare_data['underlying_index'].replace("False", np.nan).astype(float)
-    pulse_data['underlying_index'] = pulse_data['underlying_index'].replace("False", np.nan).astype(float)
-    
-    for param, settings in PARAM_SETTINGS.items():
-        if settings.get('log') == True:
-            if param in flare_data.columns:
-                flare_data[f'{param}_log'] = np.log10(flare_data[param].replace(0, np.nan))
-            if param in pulse_data.columns:
-                pulse_data[f'{param}_log'] = np.log10(pulse_data[param].replace(0, np.nan))
+    with span('features', table='flares/pulses'):
+        population = load_component_population(dataset)
     
     plot_cols = {
         'Fluence': 'fluence',
@@ -127,4 +101,12 @@ elif selected_dataset == 'Pulses/Flares':
         # 'chisq': 'bat_conversion_rchisq',
     }
     
-    population_flares(flare_data, pulse_data, plot_cols, PARAM_SETTINGS, GRB_NAMES)
+    (flare_rows, pulse_rows), highlighted = population_flares(population, plot_cols, PARAM_SETTINGS, GRB_NAMES, dataset.key, render_mode, plot_view)
+
+    export_panel({'flares': dataset.flares.loc[flare_rows], 'pulses': dataset.pulses.loc[pulse_rows]},
+                 dataset, f"laff_{os.path.basename(dataset.path)}", key='popstats_export_flares', highlighted=highlighted)
+
+    # over flares and pulses together, whatever the toggles above show
+    with span('correlations', table='flares/pulses'):
+        corr = load_correlations(dataset, 'flares+pulses', population.data, plot_cols)
+    correlation_panel(corr, plot_cols, PARAM_SETTINGS, 'flares')
@@ -0,0 +1,16 @@
+import streamlit as st
+from starlette.routing import Mount
+
+from functions import api, images
+from functions.export import exports
+
+# The viewer and the HTTP API in one server: `streamlit run server.py`.
+# Export downloads are streamed by the API's /export route, and figures are
+# served by its /figures route, so the pages only link to them when it is mounted here.
+
+API_PREFIX = '/api'
+
+exports.url_prefix = API_PREFIX
+images.url_prefix = API_PREFIX
+
+app = st.App('app.py', routes=[Mount(API_PREFIX, app=api.app)])
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from functions.diff import diff_table
+from functions.ragged import RaggedArray
+
+
+def afterglows(names, breaknum, slopes):
+    table = pd.DataFrame({'GRBname': names, 'breaknum': breaknum})
+    return table, {'slopes': RaggedArray.from_strings(slopes)}
+
+
+def test_list_columns_compared_per_element():
+    old, old_ragged = afterglows(['GRB1', 'GRB2', 'GRB3', 'GRB4'], [1, 1, 1, 0],
+                                 ['[1.0, 2.0]', '[1.0, 2.0]', '[1.0, 2.0]', '[1.5]'])
+    # GRB1 within rtol, GRB2 second slope changed, GRB3 gains a break, GRB4 removed, GRB5 added
+    new, new_ragged = afterglows(['GRB3', 'GRB2', 'GRB1', 'GRB5'], [2, 1, 1, 0],
+                                 ['[1.0, 2.0, 3.0]', '[1.0, 2.5]', '[1.0, 2.0000000001]', '[nan]'])
+
+    diff = diff_table(old, new, 'afterglow', rtol=1e-6, old_ragged=old_ragged, new_ragged=new_ragged).set_index('GRBname')
+
+    assert diff['status'].astype(str).to_dict() == {
+        'GRB1': 'unchanged', 'GRB2': 'changed', 'GRB3': 'changed', 'GRB4': 'removed', 'GRB5': 'added'}
+    assert diff.loc['GRB2', 'changed_columns'] == 'slopes'
+    assert diff.loc['GRB3', 'changed_columns'] == 'breaknum, slopes'
+
+    assert diff.loc['GRB2', 'slopes_old'] == [1.0, 2.0]
+    assert diff.loc['GRB2', 'slopes_new'] == [1.0, 2.5]
+    assert diff.loc['GRB2', 'slopes_delta'] == [0.0, 0.5]
+    assert diff.loc['GRB3', 'slopes_delta'] is None
+    assert diff.loc['GRB4', 'slopes_new'] is None
+    assert np.isnan(diff.loc['GRB5', 'slopes_new'][0])
+
+
+def test_missing_list_values_are_equal():
+    old, old_ragged = afterglows(['GRB1'], [0], ['[nan, 1.0]'])
+    new, new_ragged = afterglows(['GRB1'], [0], ['[nan, 1.0]'])
+
+    diff = diff_table(old, new, 'afterglow', old_ragged=old_ragged, new_ragged=new_ragged)
+
+    assert diff['status'].astype(str).tolist() == ['unchanged']
@@ -0,0 +1,47 @@
+import json
+import pandas as pd
+
+from functions.name_index import NameSearchIndex, burst_triggers, search_index_from_triggers
+
+
+# trigger IDs from the catalogue that collide with other bursts' names or with each other
+INDEX = NameSearchIndex(
+    ['GRB150314A', 'GRB050814A', 'GRB181126A', 'GRB060211A', 'GRB220715B', 'GRB220730A'],
+    {'GRB050814A': 150314, 'GRB060211A': 181126, 'GRB220715B': 1116441, 'GRB220730A': 1116441, 'GRB150314A': 637899},
+)
+
+
+def test_names_and_short_forms_beat_trigger_ids():
+    assert INDEX.resolve('150314') == 'GRB150314A'
+    assert INDEX.resolve('181126') == 'GRB181126A'
+    assert INDEX.resolve('GRB 150314A') == 'GRB150314A'
+
+
+def test_unique_trigger_id_resolves():
+    assert INDEX.resolve('637899') == 'GRB150314A'
+
+
+def test_shared_trigger_id_is_ambiguous():
+    assert INDEX.resolve('1116441') is None
+    assert INDEX.candidates('1116441') == ['GRB220715B', 'GRB220730A']
+    assert set(INDEX.query('1116441')[:2]) == {'GRB220715B', 'GRB220730A'}
+
+
+def test_unknown_name():
+    assert INDEX.resolve('999999') is None
+    assert INDEX.candidates('999999') == []
+
+
+def test_search_index_from_manifest_triggers():
+    tables = {
+        'afterglow': pd.DataFrame({'GRBname': ['GRB220715B', 'GRB050814A'], 'Trig_ID': [1116441, None]}),
+        'pulses': pd.DataFrame({'GRBname': ['GRB050814A', 'GRB220730A', 'GRB060211A'], 'Trig_ID': [150314, 1116441, None]}),
+    }
+    triggers = json.loads(json.dumps(burst_triggers(tables))) # as stored in manifest.json
+
+    assert triggers == {'GRB220715B': 1116441, 'GRB050814A': 150314, 'GRB220730A': 1116441, 'GRB060211A': None}
+
+    index = search_index_from_triggers(triggers)
+    assert index.names == ['GRB050814A', 'GRB060211A', 'GRB220715B', 'GRB220730A']
+    assert index.resolve('150314') == 'GRB050814A'
+    assert index.candidates('1116441') == ['GRB220715B', 'GRB220730A']
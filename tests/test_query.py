@@ -0,0 +1,57 @@
+import time
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.query import QueryError, MAX_FILTER_LENGTH, parse_filter, evaluate_filter, pushdown_filters
+
+
+DF = pd.DataFrame({'T90': [8.836, 50.0, None], 'flare_count': [0, 2, 1]})
+
+
+def matches(expression):
+    return evaluate_filter(parse_filter(expression), DF).tolist()
+
+
+def test_filter_arithmetic_and_comparisons():
+    assert matches("T90 * 2 > 20 and flare_count >= 1") == [False, True, False]
+    assert matches("flare_count in [0, 1]") == [True, False, True]
+
+
+@pytest.mark.parametrize('expression', [
+    "T90 > 9**9**9**9",  # evaluated by Python, never finishes
+    "T90 ** 2 > 1",
+    "T90 > 'x' * 1000000000000",
+    "flare_count in [0] * 1000000000000",
+    "T90 > " + " + ".join(["1"] * 200),  # too many nodes
+    "T90 > " + "1" * MAX_FILTER_LENGTH,  # too long
+])
+def test_expensive_filters_are_rejected_quickly(expression):
+    start = time.perf_counter()
+
+    with pytest.raises(QueryError):
+        matches(expression)
+
+    assert time.perf_counter() - start < 1
+
+
+def test_division_by_zero_is_a_query_error():
+    with pytest.raises(QueryError):
+        matches("T90 > 1 / 0")
+
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ("T90 == 8.836", [True, False, False]),
+    ("T90 > 8.836", [False, True, False]),
+    ("8.836 <= T90", [True, True, False]),
+    ("T90 in [8.836, 1]", [True, False, False]),
+])
+def test_float32_columns_match_their_csv_values(expression, expected):
+    # T90 is stored as float32, so 8.836 is read as 8.8360004...
+    assert evaluate_filter(parse_filter(expression), DF.astype({'T90': 'float32'})).tolist() == expected
+
+
+def test_float32_pushdown_filters_use_the_stored_value():
+    filters = pushdown_filters(parse_filter("T90 == 8.836"), 'afterglow', {'GRBname', 'T90'})
+    assert filters == [('T90', '==', np.float32(8.836))]